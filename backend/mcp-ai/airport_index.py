@@ -0,0 +1,179 @@
+# airport_index.py
+# Airports BudgetAgent can price against, with vectorized nearest-airport
+# lookup by coordinates and fuzzy lookup by city or airport name, so travel
+# queries always name a real IATA code.
+import difflib
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+# Extra "distance" charged for smaller airports when ranking by proximity:
+# a major hub a little further away usually has far more fares.
+SIZE_PENALTY_KM = {'large': 0.0, 'medium': 40.0, 'small': 100.0}
+
+# (IATA, airport name, size, lat, lon, city names served)
+AIRPORTS = [
+    ('DEL', 'Indira Gandhi International', 'large', 28.5562, 77.1000, ['Delhi', 'New Delhi', 'Gurugram', 'Gurgaon', 'Noida', 'Faridabad', 'Ghaziabad']),
+    ('BOM', 'Chhatrapati Shivaji Maharaj International', 'large', 19.0896, 72.8656, ['Mumbai', 'Bombay', 'Thane', 'Navi Mumbai']),
+    ('BLR', 'Kempegowda International', 'large', 13.1986, 77.7066, ['Bengaluru', 'Bangalore']),
+    ('MAA', 'Chennai International', 'large', 12.9941, 80.1709, ['Chennai', 'Madras']),
+    ('HYD', 'Rajiv Gandhi International', 'large', 17.2403, 78.4294, ['Hyderabad', 'Secunderabad']),
+    ('CCU', 'Netaji Subhas Chandra Bose International', 'large', 22.6547, 88.4467, ['Kolkata', 'Calcutta', 'Howrah']),
+    ('COK', 'Cochin International', 'large', 10.1520, 76.4019, ['Kochi', 'Cochin', 'Ernakulam']),
+    ('AMD', 'Sardar Vallabhbhai Patel International', 'large', 23.0772, 72.6347, ['Ahmedabad', 'Gandhinagar']),
+    ('GOI', 'Dabolim', 'medium', 15.3808, 73.8314, ['Goa', 'Vasco da Gama', 'Margao', 'Panaji']),
+    ('GOX', 'Manohar International (Mopa)', 'medium', 15.7443, 73.8606, ['North Goa', 'Mopa']),
+    ('PNQ', 'Pune', 'medium', 18.5822, 73.9197, ['Pune', 'Poona', 'Pimpri-Chinchwad']),
+    ('JAI', 'Jaipur International', 'medium', 26.8242, 75.8122, ['Jaipur']),
+    ('LKO', 'Chaudhary Charan Singh International', 'medium', 26.7606, 80.8893, ['Lucknow']),
+    ('TRV', 'Thiruvananthapuram International', 'medium', 8.4821, 76.9201, ['Thiruvananthapuram', 'Trivandrum']),
+    ('CCJ', 'Calicut International', 'medium', 11.1368, 75.9553, ['Kozhikode', 'Calicut']),
+    ('GAU', 'Lokpriya Gopinath Bordoloi International', 'medium', 26.1061, 91.5859, ['Guwahati']),
+    ('PAT', 'Jay Prakash Narayan', 'medium', 25.5913, 85.0880, ['Patna']),
+    ('BBI', 'Biju Patnaik International', 'medium', 20.2444, 85.8178, ['Bhubaneswar', 'Cuttack', 'Puri']),
+    ('IXC', 'Chandigarh International', 'medium', 30.6735, 76.7885, ['Chandigarh', 'Mohali', 'Panchkula']),
+    ('SXR', 'Sheikh ul-Alam International', 'medium', 33.9871, 74.7742, ['Srinagar']),
+    ('ATQ', 'Sri Guru Ram Dass Jee International', 'medium', 31.7096, 74.7973, ['Amritsar']),
+    ('NAG', 'Dr. Babasaheb Ambedkar International', 'medium', 21.0922, 79.0472, ['Nagpur']),
+    ('IDR', 'Devi Ahilya Bai Holkar', 'medium', 22.7218, 75.8011, ['Indore']),
+    ('VNS', 'Lal Bahadur Shastri International', 'medium', 25.4524, 82.8593, ['Varanasi', 'Banaras']),
+    ('CJB', 'Coimbatore International', 'medium', 11.0300, 77.0434, ['Coimbatore']),
+    ('IXM', 'Madurai', 'medium', 9.8345, 78.0934, ['Madurai']),
+    ('TRZ', 'Tiruchirappalli International', 'medium', 10.7654, 78.7097, ['Tiruchirappalli', 'Trichy']),
+    ('IXE', 'Mangaluru International', 'medium', 12.9613, 74.8901, ['Mangaluru', 'Mangalore', 'Udupi']),
+    ('VTZ', 'Visakhapatnam', 'medium', 17.7212, 83.2245, ['Visakhapatnam', 'Vizag']),
+    ('IXB', 'Bagdogra', 'medium', 26.6812, 88.3286, ['Siliguri', 'Darjeeling', 'Gangtok']),
+    ('IXR', 'Birsa Munda', 'medium', 23.3143, 85.3217, ['Ranchi']),
+    ('RPR', 'Swami Vivekananda', 'medium', 21.1804, 81.7388, ['Raipur']),
+    ('BHO', 'Raja Bhoj', 'medium', 23.2875, 77.3374, ['Bhopal']),
+    ('IXJ', 'Jammu', 'medium', 32.6891, 74.8374, ['Jammu']),
+    ('IXZ', 'Veer Savarkar International', 'medium', 11.6412, 92.7297, ['Port Blair']),
+    ('VGA', 'Vijayawada', 'small', 16.5304, 80.7968, ['Vijayawada']),
+    ('UDR', 'Maharana Pratap', 'small', 24.6177, 73.8961, ['Udaipur']),
+    ('JDH', 'Jodhpur', 'small', 26.2511, 73.0489, ['Jodhpur']),
+    ('IXL', 'Kushok Bakula Rimpochee', 'small', 34.1359, 77.5465, ['Leh', 'Ladakh']),
+    ('DED', 'Jolly Grant', 'small', 30.1897, 78.1803, ['Dehradun', 'Rishikesh', 'Haridwar', 'Mussoorie']),
+    ('STV', 'Surat', 'small', 21.1141, 72.7418, ['Surat']),
+    ('BDQ', 'Vadodara', 'small', 22.3362, 73.2263, ['Vadodara', 'Baroda']),
+    ('RAJ', 'Rajkot', 'small', 22.3092, 70.7795, ['Rajkot']),
+    ('BHJ', 'Bhuj', 'small', 23.2878, 69.6702, ['Bhuj', 'Kutch']),
+    ('JGA', 'Jamnagar', 'small', 22.4655, 70.0126, ['Jamnagar', 'Dwarka']),
+    ('DIU', 'Diu', 'small', 20.7131, 70.9211, ['Diu', 'Somnath']),
+    ('IXA', 'Maharaja Bir Bikram', 'small', 23.8870, 91.2404, ['Agartala']),
+    ('IMF', 'Imphal International', 'small', 24.7600, 93.8967, ['Imphal']),
+    ('DIB', 'Dibrugarh', 'small', 27.4839, 95.0169, ['Dibrugarh']),
+    ('SHL', 'Shillong', 'small', 25.7036, 91.9787, ['Shillong']),
+    ('IXS', 'Silchar', 'small', 24.9129, 92.9787, ['Silchar']),
+    ('GAY', 'Gaya', 'small', 24.7443, 84.9512, ['Gaya', 'Bodh Gaya']),
+    ('AGR', 'Agra', 'small', 27.1558, 77.9609, ['Agra']),
+    ('GWL', 'Gwalior', 'small', 26.2933, 78.2278, ['Gwalior']),
+    ('JLR', 'Jabalpur', 'small', 23.1778, 80.0520, ['Jabalpur']),
+    ('IXU', 'Aurangabad', 'small', 19.8627, 75.3981, ['Aurangabad', 'Chhatrapati Sambhajinagar']),
+    ('KLH', 'Kolhapur', 'small', 16.6647, 74.2894, ['Kolhapur']),
+    ('HBX', 'Hubli', 'small', 15.3617, 75.0849, ['Hubballi', 'Hubli', 'Dharwad']),
+    ('IXG', 'Belagavi', 'small', 15.8593, 74.6183, ['Belagavi', 'Belgaum']),
+    ('MYQ', 'Mysore', 'small', 12.2300, 76.6558, ['Mysuru', 'Mysore']),
+    ('TIR', 'Tirupati', 'small', 13.6325, 79.5433, ['Tirupati']),
+    ('RJA', 'Rajahmundry', 'small', 17.1104, 81.8182, ['Rajahmundry']),
+    ('KNU', 'Kanpur', 'small', 26.4044, 80.4100, ['Kanpur']),
+    ('IXD', 'Prayagraj', 'small', 25.4401, 81.7340, ['Prayagraj', 'Allahabad']),
+    ('GOP', 'Gorakhpur', 'small', 26.7397, 83.4497, ['Gorakhpur']),
+    ('DHM', 'Kangra', 'small', 32.1651, 76.2634, ['Dharamshala', 'Kangra', 'McLeod Ganj']),
+    ('KUU', 'Kullu-Manali', 'small', 31.8767, 77.1544, ['Kullu', 'Manali']),
+    ('SLV', 'Shimla', 'small', 31.0818, 77.0680, ['Shimla']),
+    ('TCR', 'Thoothukudi', 'small', 8.7247, 78.0258, ['Thoothukudi', 'Tuticorin']),
+    ('PNY', 'Puducherry', 'small', 11.9680, 79.8120, ['Puducherry', 'Pondicherry']),
+    ('CNN', 'Kannur International', 'small', 11.9186, 75.5472, ['Kannur']),
+    ('DXB', 'Dubai International', 'large', 25.2532, 55.3657, ['Dubai']),
+    ('SIN', 'Singapore Changi', 'large', 1.3644, 103.9915, ['Singapore']),
+    ('BKK', 'Suvarnabhumi', 'large', 13.6900, 100.7501, ['Bangkok']),
+    ('LHR', 'London Heathrow', 'large', 51.4700, -0.4543, ['London']),
+    ('CMB', 'Bandaranaike International', 'large', 7.1808, 79.8841, ['Colombo']),
+    ('DAC', 'Hazrat Shahjalal International', 'large', 23.8433, 90.3978, ['Dhaka']),
+    ('KTM', 'Tribhuvan International', 'medium', 27.6966, 85.3591, ['Kathmandu']),
+    ('MLE', 'Velana International', 'medium', 4.1918, 73.5290, ['Male', 'Maldives']),
+]
+
+
+def _normalise(name):
+    return ' '.join(str(name).lower().replace('-', ' ').split())
+
+
+class AirportIndex:
+    def __init__(self, airports=AIRPORTS):
+        self.airports = [
+            {'code': code, 'name': name, 'size': size, 'lat': lat, 'lon': lon, 'cities': cities}
+            for code, name, size, lat, lon, cities in airports
+        ]
+        coords = np.radians([(airport['lat'], airport['lon']) for airport in self.airports])
+        self._lat = coords[:, 0]
+        self._lon = coords[:, 1]
+        self._cos_lat = np.cos(self._lat)
+        self._penalty = np.array([SIZE_PENALTY_KM.get(airport['size'], 0.0) for airport in self.airports])
+        self._by_code = {airport['code']: index for index, airport in enumerate(self.airports)}
+        self._by_name = {}
+        for index, airport in enumerate(self.airports):
+            for name in [*airport['cities'], airport['name']]:
+                self._by_name.setdefault(_normalise(name), []).append(index)
+
+    def _result(self, index, distance_km=None):
+        airport = self.airports[index]
+        result = {'code': airport['code'], 'name': airport['name'], 'size': airport['size'], 'city': airport['cities'][0]}
+        if distance_km is not None:
+            result['distance_km'] = round(float(distance_km), 1)
+        return result
+
+    def distances_km(self, lat, lon):
+        """Great-circle distance from (lat, lon) to every airport at once."""
+        lat, lon = np.radians(lat), np.radians(lon)
+        a = np.sin((self._lat - lat) / 2) ** 2 + np.cos(lat) * self._cos_lat * np.sin((self._lon - lon) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    def nearest(self, lat, lon, n=3, max_km=None):
+        """Up to n airports ranked by distance plus a size penalty, best first."""
+        distances = self.distances_km(lat, lon)
+        scores = distances + self._penalty
+        if max_km is not None:
+            scores = np.where(distances <= max_km, scores, np.inf)
+        n = min(n, len(self.airports))
+        candidates = np.argpartition(scores, n - 1)[:n]
+        candidates = candidates[np.argsort(scores[candidates])]
+        return [self._result(index, distances[index]) for index in candidates if np.isfinite(scores[index])]
+
+    def resolve_name(self, name, n=3, cutoff=0.82, fuzzy=True):
+        """Airports for a city, airport name or IATA code, allowing for typos
+        unless `fuzzy` is False."""
+        if not name:
+            return []
+        code = str(name).strip().upper()
+        if len(code) == 3 and code in self._by_code:
+            return [self._result(self._by_code[code])]
+        key = _normalise(name)
+        matches = self._by_name.get(key, [])
+        if not matches and fuzzy:
+            close = difflib.get_close_matches(key, self._by_name.keys(), n=n, cutoff=cutoff)
+            matches = [index for match in close for index in self._by_name[match]]
+        return [self._result(index) for index in dict.fromkeys(matches)][:n]
+
+    def candidates(self, city, coords=None, n=3, max_km=250):
+        """Exact name matches first, then the airports nearest to `coords`
+        ({'lat', 'lon'}); typo-tolerant matching only when there are no coordinates."""
+        results = self.resolve_name(city, n=n, fuzzy=False)
+        if len(results) < n:
+            if coords:
+                extra = self.nearest(coords['lat'], coords['lon'], n=n, max_km=max_km)
+            else:
+                extra = self.resolve_name(city, n=n)
+            seen = {result['code'] for result in results}
+            results.extend(result for result in extra if result['code'] not in seen)
+        return results[:n]
+
+
+_index = None
+
+
+def get_index():
+    global _index
+    if _index is None:
+        _index = AirportIndex()
+    return _index
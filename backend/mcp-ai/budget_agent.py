@@ -1,9 +1,44 @@
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+
+import airport_index
+import metrics
+import price_cache
+import price_prefetcher
+from combo_optimizer import top_k_combinations
+from hedging import HedgeBudget, LatencyTracker, run_hedged
+from map_agent import MapAgent
+from circuit_breaker import CircuitOpenError, get_breaker
+
+# Concurrent /travel lookups when pricing a range of dates.
+CALENDAR_WORKERS = int(os.getenv("BUDGET_CALENDAR_WORKERS", "4"))
+CALENDAR_MAX_WINDOW_DAYS = int(os.getenv("BUDGET_CALENDAR_MAX_WINDOW_DAYS", "7"))
+# Geocode cities missing from the gazetteer (cached, rate limited) to find their nearest airport.
+GEOCODE_AIRPORTS = os.getenv("BUDGET_GEOCODE_AIRPORTS", "1") != "0"
+GAZETTEER = {city["name"].lower(): {"lat": city["lat"], "lon": city["lon"]} for city in MapAgent.MAJOR_CITIES}
+# Opt-in hedging for /travel: a duplicate request goes out once the first is
+# slower than the recent p90, within a budget of BUDGET_HEDGE_MAX_RATIO extra load.
+HEDGE_TRAVEL_API = os.getenv("BUDGET_HEDGE", "0") == "1"
+HEDGE_DEFAULT_DELAY = float(os.getenv("BUDGET_HEDGE_DEFAULT_DELAY", "5"))
+HEDGE_MIN_DELAY = float(os.getenv("BUDGET_HEDGE_MIN_DELAY", "0.5"))
+HEDGE_MIN_SAMPLES = 10
+# Hedged attempts give up this multiple of the recent p99 after the hedge
+# delay (within the usual timeout), so a losing duplicate does not linger.
+HEDGE_ATTEMPT_TIMEOUT_FACTOR = float(os.getenv("BUDGET_HEDGE_ATTEMPT_TIMEOUT_FACTOR", "3"))
+HEDGE_MIN_ATTEMPT_TIMEOUT = float(os.getenv("BUDGET_HEDGE_MIN_ATTEMPT_TIMEOUT", "5"))
+_travel_latency = LatencyTracker(window=200)
+_hedge_budget = HedgeBudget(float(os.getenv("BUDGET_HEDGE_MAX_RATIO", "0.1")))
+# Concurrent /travel lookups when pricing the legs of a multi-city route.
+LEG_WORKERS = int(os.getenv("BUDGET_LEG_WORKERS", "6"))
+# Transport + hotel pairs listed in a budget summary.
+TOP_COMBINATIONS = int(os.getenv("BUDGET_TOP_COMBINATIONS", "5"))
 
 
 class BudgetAgent:
@@ -13,11 +48,15 @@ class BudgetAgent:
         self.base_url = os.getenv("BUDGET_AGENT_API_BASE", "http://localhost:3000/api")
         self.timeout = float(os.getenv("BUDGET_AGENT_TIMEOUT", "25"))
         self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=max(10, CALENDAR_WORKERS, LEG_WORKERS)))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=max(10, CALENDAR_WORKERS, LEG_WORKERS)))
         self.session.headers.update({
             "Accept": "application/json",
             "User-Agent": "BudgetAgent/1.0"
         })
         self.city_iata_map = self._load_city_iata_map()
+        self._resolved_iata: Dict[str, str] = {}
+        self._geocoder = None
 
     def _load_city_iata_map(self) -> Dict[str, str]:
         mapping = {
@@ -42,11 +81,37 @@ class BudgetAgent:
                 pass
         return mapping
 
+    def _city_coordinates(self, city: str) -> Optional[Dict[str, float]]:
+        coords = GAZETTEER.get(city.lower().strip())
+        if coords or not GEOCODE_AIRPORTS:
+            return coords
+        try:
+            if self._geocoder is None:
+                from freeDataService import FreeDataService
+                self._geocoder = FreeDataService()
+            return self._geocoder.get_coordinates(city)
+        except Exception as exc:
+            print(f" [BudgetAgent] Could not geocode {city}: {exc}")
+            return None
+
+    def airport_candidates(self, city: str, n: int = 3) -> List[Dict[str, Any]]:
+        """Up to n real airports for a city: by name, else nearest to its coordinates."""
+        index = airport_index.get_index()
+        exact = index.resolve_name(city, n=n, fuzzy=False)
+        if len(exact) >= n:
+            return exact
+        return index.candidates(city, self._city_coordinates(city), n=n)
+
     def _to_iata(self, city: str) -> str:
         if not city:
             return city
         city_key = city.lower().strip()
-        return self.city_iata_map.get(city_key, city[:3].upper())
+        if city_key in self.city_iata_map:
+            return self.city_iata_map[city_key]
+        if city_key not in self._resolved_iata:
+            candidates = self.airport_candidates(city, n=1)
+            self._resolved_iata[city_key] = candidates[0]["code"] if candidates else city[:3].upper()
+        return self._resolved_iata[city_key]
 
     def _normalise_date(self, iso_date: Optional[str]) -> Optional[str]:
         if not iso_date:
@@ -80,8 +145,8 @@ class BudgetAgent:
         start_dt = datetime.fromisoformat(start)
         return (start_dt + timedelta(days=1)).date().isoformat()
 
-    def _call_travel_api(self, origin: str, destination: str, start_date: str, end_date: str, adults: int) -> Dict[str, Any]:
-        params = {
+    def _travel_params(self, origin: str, destination: str, start_date: str, end_date: str, adults: int) -> Dict[str, Any]:
+        return {
             "origin": self._to_iata(origin),
             "destination": self._to_iata(destination),
             "date": start_date,
@@ -90,6 +155,81 @@ class BudgetAgent:
             "adults": max(1, adults),
         }
 
+    def _get_travel_once(self, params: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        started = time.monotonic()
+        try:
+            response = self.session.get(f"{self.base_url}/travel", params=params, timeout=timeout or self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            _travel_latency.record_error()
+            raise
+        _travel_latency.record(time.monotonic() - started)
+        return data
+
+    def _hedge_delay(self) -> float:
+        if _travel_latency.samples < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, _travel_latency.percentile(0.9))
+
+    def _attempt_timeout(self) -> float:
+        """Timeout for each hedged attempt: the hedge delay plus a multiple of the
+        recent p99. requests cannot abort a call in flight, so this is what bounds
+        how long the losing attempt holds its thread and pooled connection after
+        the winner has returned."""
+        if _travel_latency.samples < HEDGE_MIN_SAMPLES:
+            return self.timeout
+        p99 = _travel_latency.percentile(0.99)
+        return min(self.timeout, self._hedge_delay() + max(HEDGE_MIN_ATTEMPT_TIMEOUT, HEDGE_ATTEMPT_TIMEOUT_FACTOR * p99))
+
+    def _get_travel(self, params: Dict[str, Any]) -> Any:
+        if not HEDGE_TRAVEL_API:
+            return self._get_travel_once(params)
+
+        _hedge_budget.record_request()
+
+        def should_hedge() -> bool:
+            allowed = _hedge_budget.try_spend()
+            metrics.inc("travel_api_hedges_total", outcome="sent" if allowed else "over_budget")
+            return allowed
+
+        timeout = self._attempt_timeout()
+        index, data = run_hedged(
+            [lambda: self._get_travel_once(params, timeout)] * 2,
+            self._hedge_delay(),
+            should_hedge=should_hedge,
+            max_hedges=1,
+            failover=False,
+        )
+        if index > 0:
+            metrics.inc("travel_api_hedge_wins_total")
+        return data
+
+    def _fetch_travel_data(self, params: Dict[str, Any]) -> Any:
+        """Raw /travel response, or {} when the backend fails or its breaker is open."""
+        cache = price_cache.get_cache()
+        price_prefetcher.record(params)
+        try:
+            if cache is None:
+                return get_breaker("travel_api").call(self._get_travel, params)
+            return cache.get_or_fetch(
+                price_cache.price_key(params),
+                lambda: get_breaker("travel_api").call(self._get_travel, params),
+            )
+        except CircuitOpenError:
+            print(" [BudgetAgent] Travel API circuit open; using fallback options.")
+        except Exception as exc:
+            print(f" [BudgetAgent] Travel API fallback engaged: {exc}")
+        return {}
+
+    def _call_travel_api(self, origin: str, destination: str, start_date: str, end_date: str, adults: int) -> Dict[str, Any]:
+        params = self._travel_params(origin, destination, start_date, end_date, adults)
+        return self._assemble_travel_response(self._fetch_travel_data(params), params, destination, start_date, end_date)
+
+    def _assemble_travel_response(
+        self, data: Any, params: Dict[str, Any], destination: str, start_date: str, end_date: str
+    ) -> Dict[str, Any]:
+        """Fills whatever the travel data lacks with fallback options and picks the cheapest trip."""
         fallback_currency = "INR"
         fallback_flight = {
             "type": "flight",
@@ -137,14 +277,6 @@ class BudgetAgent:
             }
         }
 
-        try:
-            response = self.session.get(f"{self.base_url}/travel", params=params, timeout=self.timeout)
-            response.raise_for_status()
-            data = response.json()
-        except Exception as exc:
-            print(f" [BudgetAgent] Travel API fallback engaged: {exc}")
-            data = {}
-
         flights = data.get("flights") if isinstance(data, dict) else None
         hotels = data.get("hotels") if isinstance(data, dict) else None
         trains = data.get("trains") if isinstance(data, dict) else None
@@ -184,10 +316,29 @@ class BudgetAgent:
         priced_items = [item for item in items if isinstance(item, dict) and isinstance(item.get("price"), (int, float))]
         if not priced_items:
             return None
-        priced_items.sort(key=lambda entry: entry.get("price", float("inf")))
-        return priced_items[0]
+        return min(priced_items, key=lambda entry: entry["price"])
 
-    def generate_budget_summary(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    def _top_combinations(self, transports: List[Dict[str, Any]], hotels: List[Dict[str, Any]], payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Cheapest transport + hotel pairs under the constraints the request carries:
+        max_travel_hours, min_hotel_rating and arrive_before_checkin."""
+        def number(key: str) -> Optional[float]:
+            try:
+                return float(payload[key]) if payload.get(key) is not None else None
+            except (TypeError, ValueError):
+                return None
+
+        max_hours = number("max_travel_hours")
+        return top_k_combinations(
+            transports,
+            hotels,
+            k=int(number("top_k") or TOP_COMBINATIONS),
+            max_duration_minutes=max_hours * 60 if max_hours is not None else None,
+            min_rating=number("min_hotel_rating"),
+            arrive_before_checkin=bool(payload.get("arrive_before_checkin")),
+        )
+
+    def _request_fields(self, payload: Dict[str, Any]) -> Tuple[str, str, str, str, int, List[str]]:
+        """(origin, destination, start_date, end_date, adults, notes) with defaults filled in."""
         fallback_notes = []
 
         origin = (
@@ -220,6 +371,215 @@ class BudgetAgent:
         except (TypeError, ValueError):
             adults = 1
             fallback_notes.append("Traveller count invalid; defaulted to 1 adult.")
+        return origin, destination, start_date, end_date, adults, fallback_notes
+
+    def price_calendar(self, payload: Dict[str, Any], window_days: Optional[int] = None) -> Dict[str, Any]:
+        """Cheapest transport + hotel total for every start date within
+        ±window_days of the requested one, keeping the length of stay.
+
+        Dates are priced concurrently and go through the price cache, so dates
+        already looked up cost nothing. Past dates are skipped. Dates without a
+        real transport and hotel offer are priced None and listed as unavailable.
+        """
+        origin, destination, start_date, end_date, adults, notes = self._request_fields(payload)
+        if window_days is None:
+            window_days = payload.get("window_days", 3)
+        try:
+            window_days = min(CALENDAR_MAX_WINDOW_DAYS, max(0, int(window_days)))
+        except (TypeError, ValueError):
+            window_days = 3
+            notes.append("Window invalid; defaulted to ±3 days.")
+
+        start = datetime.fromisoformat(start_date).date()
+        stay = max(timedelta(days=1), datetime.fromisoformat(end_date).date() - start)
+        today = datetime.utcnow().date()
+        starts = [start + timedelta(days=offset) for offset in range(-window_days, window_days + 1)]
+        starts = [day for day in starts if day >= today]
+
+        def price(day):
+            # Real offers only: the fallback options are placeholders, not fares.
+            params = self._travel_params(origin, destination, day.isoformat(), (day + stay).isoformat(), adults)
+            data = self._fetch_travel_data(params)
+            if not isinstance(data, dict):
+                return day.isoformat(), None, None
+            trip = data.get("cheapestTrip")
+            if isinstance(trip, dict) and isinstance(trip.get("totalCost"), (int, float)):
+                return day.isoformat(), trip["totalCost"], trip.get("currency")
+            lists = [data.get(key) if isinstance(data.get(key), list) else [] for key in ("flights", "trains", "hotels")]
+            transport = self._pick_cheapest([*lists[0], *lists[1]])
+            hotel = self._pick_cheapest(lists[2])
+            if not transport or not hotel:
+                return day.isoformat(), None, None
+            return day.isoformat(), transport["price"] + hotel["price"], transport.get("currency") or hotel.get("currency")
+
+        prices: Dict[str, Optional[float]] = {}
+        currency = "INR"
+        if starts:
+            with ThreadPoolExecutor(max_workers=max(1, min(CALENDAR_WORKERS, len(starts)))) as pool:
+                for day, total, trip_currency in pool.map(price, starts):
+                    prices[day] = total
+                    currency = trip_currency or currency
+
+        priced = {day: total for day, total in prices.items() if isinstance(total, (int, float))}
+        unavailable = sorted(day for day in prices if day not in priced)
+        if unavailable:
+            notes.append("No live fares for some dates; they are listed as unavailable.")
+        cheapest_date = min(priced, key=priced.get) if priced else None
+        return {
+            "source": "budget_agent",
+            "fetched_at": datetime.utcnow().isoformat() + "Z",
+            "request": {
+                "origin": origin,
+                "destination": destination,
+                "start_date": start_date,
+                "end_date": end_date,
+                "adults": adults,
+                "window_days": window_days
+            },
+            "currency": currency,
+            "nights": stay.days,
+            "prices": prices,
+            "unavailable_dates": unavailable,
+            "cheapest_date": cheapest_date,
+            "cheapest_total": priced.get(cheapest_date) if cheapest_date else None,
+            "notes": notes
+        }
+
+    @staticmethod
+    def _is_multi_stop(stops: Any) -> bool:
+        """True when `stops` stays overnight in more than one distinct city."""
+        if not isinstance(stops, list):
+            return False
+        overnight = set()
+        for stop in stops:
+            if not isinstance(stop, dict) or not stop.get("city"):
+                continue
+            try:
+                nights = int(stop.get("nights", 1))
+            except (TypeError, ValueError):
+                nights = 1
+            if nights > 0:
+                overnight.add(str(stop["city"]).lower())
+        return len(overnight) > 1
+
+    def _route_legs(
+        self, start_city: str, start_date: str, stops: List[Dict[str, Any]], end_date: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """One leg per overnight stop: travel from the previous place, then the stay.
+        The final stay checks out on `end_date` when that is later."""
+        legs = []
+        previous = start_city
+        day = datetime.fromisoformat(start_date).date()
+        for stop in stops:
+            city = stop.get("city") if isinstance(stop, dict) else None
+            if not city:
+                continue
+            try:
+                nights = max(0, int(stop.get("nights", 1)))
+            except (TypeError, ValueError):
+                nights = 1
+            if nights or city.lower() != str(previous).lower():
+                legs.append({
+                    "from": previous,
+                    "to": city,
+                    "check_in": day.isoformat(),
+                    "check_out": (day + timedelta(days=nights)).isoformat(),
+                    "nights": nights,
+                    "needs_transport": city.lower() != str(previous).lower(),
+                })
+            day += timedelta(days=nights)
+            previous = city
+        if legs and end_date:
+            last = legs[-1]
+            check_in = datetime.fromisoformat(last["check_in"]).date()
+            check_out = datetime.fromisoformat(end_date).date()
+            if check_out > check_in:
+                last["check_out"] = check_out.isoformat()
+                last["nights"] = (check_out - check_in).days
+        return legs
+
+    def generate_route_budget(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Budget for a multi-city route: every leg's transport and stay priced
+        concurrently (cached legs are reused) and summed into a trip total.
+
+        `payload["stops"]` lists {"city", "nights"} in visiting order after
+        start_city; the final stay checks out on the requested end_date. The
+        summary keeps the single-trip fields for the first leg.
+        """
+        origin, _, start_date, end_date, adults, notes = self._request_fields(payload)
+        legs = self._route_legs(origin, start_date, payload.get("stops") or [], end_date)
+        if not legs:
+            return self.generate_budget_summary({key: value for key, value in payload.items() if key != "stops"})
+
+        def price(leg: Dict[str, Any]) -> Dict[str, Any]:
+            # Hotels need at least one night in the query even when none is booked.
+            query_check_out = self._ensure_checkout(leg["check_in"], leg["check_out"] if leg["nights"] else None)
+            response = self._call_travel_api(leg["from"], leg["to"], leg["check_in"], query_check_out, adults)
+            transports = [*response.get("flights", []), *response.get("trains", [])] if leg["needs_transport"] else []
+            hotels = response.get("hotels", []) if leg["nights"] else []
+            transport = self._pick_cheapest(transports)
+            hotel = self._pick_cheapest(hotels)
+            transport_cost = (transport or {}).get("price", 0) or 0
+            hotel_cost = (hotel or {}).get("price", 0) or 0
+            return {
+                **{key: value for key, value in leg.items() if key != "needs_transport"},
+                "transport": transport,
+                "hotel": hotel,
+                "top_combinations": self._top_combinations(transports, hotels, payload),
+                "raw": {
+                    "flights_count": len(response.get("flights", [])) if leg["needs_transport"] else 0,
+                    "trains_count": len(response.get("trains", [])) if leg["needs_transport"] else 0,
+                    "hotels_count": len(hotels),
+                },
+                "transport_cost": transport_cost,
+                "hotel_cost": hotel_cost,
+                "subtotal": transport_cost + hotel_cost,
+                "currency": (transport or {}).get("currency") or (hotel or {}).get("currency") or "INR",
+            }
+
+        with ThreadPoolExecutor(max_workers=max(1, min(LEG_WORKERS, len(legs)))) as pool:
+            priced_legs = list(pool.map(price, legs))
+
+        total = sum(leg["subtotal"] for leg in priced_legs)
+        currency = next((leg["currency"] for leg in priced_legs if leg["transport"] or leg["hotel"]), "INR")
+        first_transport = next((leg["transport"] for leg in priced_legs if leg["transport"]), None)
+        first_hotel = next((leg["hotel"] for leg in priced_legs if leg["hotel"]), None)
+        return {
+            "source": "budget_agent",
+            "fetched_at": datetime.utcnow().isoformat() + "Z",
+            "request": {
+                "origin": origin,
+                "destination": priced_legs[-1]["to"],
+                "start_date": start_date,
+                "end_date": priced_legs[-1]["check_out"],
+                "adults": adults,
+                "stops": len(priced_legs)
+            },
+            "cheapest_trip": {
+                "transport": first_transport,
+                "hotel": first_hotel,
+                "totalCost": total,
+                "currency": currency
+            },
+            "cheapest_transport": first_transport,
+            "cheapest_hotel": first_hotel,
+            # Pairs for the first leg that has both travel and a stay to choose.
+            "top_combinations": next((leg["top_combinations"] for leg in priced_legs if leg["top_combinations"]), []),
+            "raw": {
+                key: sum(leg["raw"][key] for leg in priced_legs)
+                for key in ("flights_count", "trains_count", "hotels_count")
+            },
+            "legs": priced_legs,
+            "trip_total": total,
+            "transport_total": sum(leg["transport_cost"] for leg in priced_legs),
+            "hotel_total": sum(leg["hotel_cost"] for leg in priced_legs),
+            "notes": notes
+        }
+
+    def generate_budget_summary(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if self._is_multi_stop(payload.get("stops")):
+            return self.generate_route_budget(payload)
+        origin, destination, start_date, end_date, adults, fallback_notes = self._request_fields(payload)
 
         try:
             travel_response = self._call_travel_api(origin, destination, start_date, end_date, adults)
@@ -261,6 +621,7 @@ class BudgetAgent:
                 "cheapest_trip": cheapest_trip,
                 "cheapest_transport": cheapest_transport,
                 "cheapest_hotel": cheapest_hotel,
+                "top_combinations": self._top_combinations([*flights, *trains], hotels, payload),
                 "raw": {
                     "flights_count": len(flights),
                     "trains_count": len(trains),
@@ -273,7 +634,9 @@ class BudgetAgent:
 
             fallback_notes.append("Budget agent executed resilience fallback due to upstream failure.")
 
-            travel_response = self._call_travel_api(origin, destination, start_date, end_date, adults)
+            # Fallback options only: the travel API was already tried for this request.
+            params = self._travel_params(origin, destination, start_date, end_date, adults)
+            travel_response = self._assemble_travel_response({}, params, destination, start_date, end_date)
             flights = travel_response.get("flights", [])
             trains = travel_response.get("trains", [])
             hotels = travel_response.get("hotels", [])
@@ -302,6 +665,7 @@ class BudgetAgent:
                 "cheapest_trip": cheapest_trip,
                 "cheapest_transport": cheapest_transport,
                 "cheapest_hotel": cheapest_hotel,
+                "top_combinations": self._top_combinations([*flights, *trains], hotels, payload),
                 "raw": {
                     "flights_count": len(flights),
                     "trains_count": len(trains),
@@ -1,9 +1,12 @@
 import json
+import os
 import time
 
 import pika
 
+import metrics
 from budget_agent import BudgetAgent
+from price_prefetcher import PricePrefetcher
 
 
 def on_request(ch, method, props, body):
@@ -42,10 +45,34 @@ def on_request(ch, method, props, body):
             }
             ch.basic_publish(exchange='', routing_key='orchestrator_queue', body=json.dumps(error_response))
 
+    elif intent == "GeneratePriceCalendar":
+        agent = BudgetAgent()
+        try:
+            calendar = agent.price_calendar(payload)
+        except Exception as exc:
+            print(f" [BudgetAgent] Error generating price calendar: {exc}")
+            calendar = {
+                "source": "budget_agent",
+                "error": str(exc),
+                "notes": ["Budget agent failed to compute price calendar."]
+            }
+        response_message = {
+            "trip_id": trip_id,
+            "intent": "PriceCalendarComputed",
+            "payload": {
+                "price_calendar": calendar
+            }
+        }
+        ch.basic_publish(exchange='', routing_key='orchestrator_queue', body=json.dumps(response_message))
+        print(f" [BudgetAgent] Sent price calendar for trip '{trip_id}' back to orchestrator.")
+
+    metrics.dump('budget_agent')
     ch.basic_ack(delivery_tag=method.delivery_tag)
 
 
 def start_agent():
+    if os.environ.get("BUDGET_PREFETCH_ENABLED", "1") != "0":
+        PricePrefetcher(BudgetAgent()).start()
     while True:
         try:
             connection = pika.BlockingConnection(pika.ConnectionParameters('localhost'))
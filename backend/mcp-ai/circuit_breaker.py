@@ -0,0 +1,107 @@
+# circuit_breaker.py
+# Per-upstream circuit breakers. After enough consecutive failures a breaker
+# opens and calls fail fast, so callers take their fallback path at once
+# instead of waiting out a timeout. After a cool-down one probe call is let
+# through (half-open); its outcome closes the breaker or opens it again.
+import os
+import threading
+import time
+
+import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+# Gauge values for circuit_breaker_state.
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.half_open_max_calls = max(1, int(half_open_max_calls))
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        metrics.set_gauge('circuit_breaker_state', STATE_VALUES[CLOSED], breaker=name)
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _set_state(self, state):
+        if state == self._state:
+            return
+        print(f" [CircuitBreaker] {self.name}: {self._state} -> {state}")
+        self._state = state
+        metrics.set_gauge('circuit_breaker_state', STATE_VALUES[state], breaker=self.name)
+        metrics.inc('circuit_breaker_transitions_total', breaker=self.name, state=state)
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+            self._probes = 0
+
+    def allow(self):
+        """Whether a call may go out now; counts it as a probe when half-open."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+        metrics.inc('circuit_breaker_rejections_total', breaker=self.name)
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def call(self, func, *args, **kwargs):
+        """Runs func through the breaker; raises CircuitOpenError when it is open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Process-wide breaker for an upstream, configured from
+    <NAME>_BREAKER_FAILURES and <NAME>_BREAKER_RESET_SECONDS."""
+    with _breakers_lock:
+        if name not in _breakers:
+            prefix = name.upper()
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=int(os.environ.get(f"{prefix}_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.environ.get(f"{prefix}_BREAKER_RESET_SECONDS", "30")),
+            )
+        return _breakers[name]
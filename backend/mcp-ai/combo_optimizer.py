@@ -0,0 +1,106 @@
+# combo_optimizer.py
+# Cheapest (transport, hotel) combinations without building the cross product:
+# both lists are sorted by price once and pairs are enumerated lazily from a
+# heap in order of total cost, skipping pairs that break a constraint.
+import heapq
+import re
+
+DEFAULT_CHECKIN_TIME = "14:00"
+_DURATION_RE = re.compile(r'(?:(\d+)\s*d)?\s*(?:(\d+)\s*h)?\s*(?:(\d+)\s*m)?', re.IGNORECASE)
+
+
+def _price(item):
+    price = item.get("price") if isinstance(item, dict) else None
+    return price if isinstance(price, (int, float)) else None
+
+
+def duration_minutes(value):
+    """Minutes in "2h 15m", "1d 3h" or ISO-8601 "PT2H15M"; None when unknown."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    text = value.strip().upper()
+    if text.startswith("P"):
+        text = text.replace("P", "").replace("T", "").replace("H", "h ").replace("M", "m").replace("D", "d ")
+    match = _DURATION_RE.fullmatch(text.strip())
+    if not match or not any(match.groups()):
+        return None
+    days, hours, minutes = (int(group or 0) for group in match.groups())
+    return days * 1440 + hours * 60 + minutes
+
+
+def _clock_minutes(value):
+    if not isinstance(value, str):
+        return None
+    match = re.search(r'(\d{1,2}):(\d{2})', value)
+    return int(match.group(1)) * 60 + int(match.group(2)) if match else None
+
+
+def _details(item):
+    details = item.get("details") if isinstance(item, dict) else None
+    return details if isinstance(details, dict) else {}
+
+
+def top_k_combinations(transports, hotels, k=5, max_duration_minutes=None, min_rating=None,
+                       arrive_before_checkin=False, default_checkin=DEFAULT_CHECKIN_TIME, max_pops=None):
+    """The k cheapest (transport, hotel) pairs by total price, cheapest first.
+
+    Transport longer than `max_duration_minutes` and hotels rated below
+    `min_rating` are dropped up front. With `arrive_before_checkin`, pairs
+    whose arrival time is after the hotel's check-in time are skipped. Items
+    without the relevant field are kept. At most `max_pops` pairs are examined.
+    """
+    if k <= 0:
+        return []
+    transport_pool = []
+    for item in transports or []:
+        price = _price(item)
+        if price is None:
+            continue
+        if max_duration_minutes is not None:
+            minutes = duration_minutes(item.get("duration"))
+            if minutes is not None and minutes > max_duration_minutes:
+                continue
+        transport_pool.append((price, item))
+    hotel_pool = []
+    for item in hotels or []:
+        price = _price(item)
+        if price is None:
+            continue
+        rating = _details(item).get("rating", item.get("rating"))
+        if min_rating is not None and isinstance(rating, (int, float)) and rating < min_rating:
+            continue
+        hotel_pool.append((price, item))
+    if not transport_pool or not hotel_pool:
+        return []
+
+    transport_pool.sort(key=lambda entry: entry[0])
+    hotel_pool.sort(key=lambda entry: entry[0])
+    arrivals = [_clock_minutes(_details(item).get("arrivalTime")) for _, item in transport_pool]
+    default_checkin_minutes = _clock_minutes(default_checkin)
+    checkins = [
+        _clock_minutes(_details(item).get("checkInTime")) or default_checkin_minutes
+        for _, item in hotel_pool
+    ]
+
+    max_pops = max_pops or (k * 50 + len(transport_pool) + len(hotel_pool))
+    heap = [(transport_pool[0][0] + hotel_pool[0][0], 0, 0)]
+    seen = {(0, 0)}
+    results = []
+    pops = 0
+    while heap and len(results) < k and pops < max_pops:
+        total, i, j = heapq.heappop(heap)
+        pops += 1
+        fits = not arrive_before_checkin or arrivals[i] is None or checkins[j] is None or arrivals[i] <= checkins[j]
+        if fits:
+            transport, hotel = transport_pool[i][1], hotel_pool[j][1]
+            results.append({
+                "transport": transport,
+                "hotel": hotel,
+                "totalCost": total,
+                "currency": transport.get("currency") or hotel.get("currency") or "INR",
+            })
+        for next_i, next_j in ((i + 1, j), (i, j + 1)):
+            if next_i < len(transport_pool) and next_j < len(hotel_pool) and (next_i, next_j) not in seen:
+                seen.add((next_i, next_j))
+                heapq.heappush(heap, (transport_pool[next_i][0] + hotel_pool[next_j][0], next_i, next_j))
+    return results
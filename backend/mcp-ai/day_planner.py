@@ -0,0 +1,184 @@
+# day_planner.py
+# Geographic ordering of a city's candidate stops, so consecutive activities in
+# a day are near each other instead of bouncing across town.
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # brute-force NumPy search is fine for a city's worth of places
+    cKDTree = None
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON = 111.320
+
+
+def has_coordinates(item):
+    coords = (item or {}).get('coordinates') or {}
+    return coords.get('lat') is not None and coords.get('lon') is not None
+
+
+def project(latlon, origin=None):
+    """Equirectangular projection to kilometres; accurate at city scale."""
+    latlon = np.asarray(latlon, dtype=float).reshape(-1, 2)
+    origin = latlon.mean(axis=0) if origin is None else np.asarray(origin, dtype=float)
+    xy = np.empty_like(latlon)
+    xy[:, 0] = (latlon[:, 1] - origin[1]) * KM_PER_DEGREE_LON * np.cos(np.radians(origin[0]))
+    xy[:, 1] = (latlon[:, 0] - origin[0]) * KM_PER_DEGREE_LAT
+    return xy
+
+
+def pairwise_distances(xy):
+    return np.hypot(xy[:, 0, None] - xy[None, :, 0], xy[:, 1, None] - xy[None, :, 1])
+
+
+def nearest_neighbour_order(dist, start=0):
+    n = dist.shape[0]
+    order = np.empty(n, dtype=int)
+    visited = np.zeros(n, dtype=bool)
+    current = start
+    for step in range(n):
+        order[step] = current
+        visited[current] = True
+        if step == n - 1:
+            break
+        row = np.where(visited, np.inf, dist[current])
+        current = int(row.argmin())
+    return order
+
+
+def two_opt(order, dist, max_rounds=None, moves_per_round=32, neighbours=10):
+    """Open-path 2-opt with the first stop fixed.
+
+    Only moves that join a stop to one of its `neighbours` nearest stops are
+    scored (the usual 2-opt neighbour lists), so a round costs O(n * neighbours)
+    instead of O(n^2). Each round scores those moves at once and applies the
+    best few that don't touch each other, which keeps the number of rounds small.
+    """
+    order = np.array(order, dtype=int)
+    n = len(order)
+    if n < 4:
+        return order
+    max_rounds = max_rounds or 2 * n
+    k = min(neighbours, n - 1)
+    # The k nearest stops of every stop (plus, usually, the stop itself).
+    nearest = np.argpartition(dist, k, axis=1)[:, :k + 1]
+    x = np.repeat(np.arange(n), k + 1)
+    position = np.empty(n, dtype=int)
+    last = n - 1
+    for _ in range(max_rounds):
+        position[order] = np.arange(n)
+        # Move (i, j) reverses order[i..j] for 1 <= i < j <= n - 1, replacing edges
+        # (i-1, i) and (j, j+1) with (i-1, j) and (i, j+1). To create the edge from
+        # the stop at x to a neighbour at y: (x + 1, y) when y is later on the path,
+        # (y, x - 1) when it is earlier.
+        y = position[nearest[order].ravel()]
+        later = y > x + 1
+        earlier = (y < x - 1) & (y >= 1)
+        i = np.concatenate([x[later] + 1, y[earlier]])
+        j = np.concatenate([y[later], x[earlier] - 1])
+        before, first, end = order[i - 1], order[i], order[j]
+        # When j is the last stop there is no (j, j+1) edge.
+        after = order[np.minimum(j + 1, last)]
+        delta = dist[before, end] - dist[before, first] + np.where(j < last, dist[first, after] - dist[end, after], 0.0)
+
+        improving = np.flatnonzero(delta < -1e-9)
+        if not len(improving):
+            break
+        applied = []
+        for candidate in improving[np.argsort(delta[improving])]:
+            move_i, move_j = int(i[candidate]), int(j[candidate])
+            # Independent moves must not share any edge: keep [i - 1, j + 1] disjoint.
+            if any(move_i - 1 <= other_j + 1 and other_i - 1 <= move_j + 1 for other_i, other_j in applied):
+                continue
+            applied.append((move_i, move_j))
+            if len(applied) == moves_per_round:
+                break
+        for move_i, move_j in applied:
+            order[move_i:move_j + 1] = order[move_i:move_j + 1][::-1].copy()
+    return order
+
+
+def order_stops(items, anchor=None):
+    """Returns `items` in visiting order, starting nearest to `anchor` ({'lat', 'lon'}).
+
+    Items without coordinates keep their relative order and go last.
+    """
+    located = [item for item in items if has_coordinates(item)]
+    unlocated = [item for item in items if not has_coordinates(item)]
+    if len(located) < 2:
+        return located + unlocated
+
+    latlon = [(item['coordinates']['lat'], item['coordinates']['lon']) for item in located]
+    has_anchor = anchor is not None and anchor.get('lat') is not None and anchor.get('lon') is not None
+    if has_anchor:
+        latlon.insert(0, (anchor['lat'], anchor['lon']))
+    dist = pairwise_distances(project(latlon))
+    if has_anchor:
+        route = two_opt(nearest_neighbour_order(dist, start=0), dist)[1:] - 1
+    else:
+        # Without an anchor, start from the stop furthest from the centroid so
+        # the path sweeps across the city rather than starting in the middle.
+        start = int(np.argmax(dist.sum(axis=1)))
+        route = two_opt(nearest_neighbour_order(dist, start=start), dist)
+    return [located[i] for i in route] + unlocated
+
+
+class NearestPlaces:
+    """Spatial index over a city's places (e.g. restaurants) for k-nearest lookups."""
+
+    def __init__(self, items):
+        self.items = [item for item in items if has_coordinates(item)]
+        self._origin = None
+        self._xy = None
+        self._tree = None
+        if self.items:
+            latlon = np.array([(item['coordinates']['lat'], item['coordinates']['lon']) for item in self.items])
+            self._origin = latlon.mean(axis=0)
+            self._xy = project(latlon, self._origin)
+            if cKDTree is not None:
+                self._tree = cKDTree(self._xy)
+
+    def __len__(self):
+        return len(self.items)
+
+    def query(self, points, k=5):
+        """Indices into `items` of the k nearest places to each {'lat', 'lon'} point,
+        one row per point, closest first. Answers every point in one call.
+        """
+        k = min(k, len(self.items))
+        if not points or k == 0:
+            return np.empty((len(points or []), 0), dtype=int)
+        xy = project([(point['lat'], point['lon']) for point in points], self._origin)
+        if self._tree is not None:
+            _, indices = self._tree.query(xy, k=k)
+            return np.asarray(indices, dtype=int).reshape(len(points), k)
+        dist = np.hypot(xy[:, 0, None] - self._xy[None, :, 0], xy[:, 1, None] - self._xy[None, :, 1])
+        if k < len(self.items):
+            nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            nearest = np.broadcast_to(np.arange(len(self.items)), dist.shape)
+        closest_first = np.argsort(np.take_along_axis(dist, nearest, axis=1), axis=1)
+        return np.take_along_axis(nearest, closest_first, axis=1)
+
+    def pick(self, points, used, k=5):
+        """One place per point, nearest first, skipping places in `used` (a set of
+        indices, updated in place) while unused ones remain among the k nearest.
+        Once those run out, places are reused, but not twice in the same call.
+        Returns None for points that are None.
+        """
+        located = [point for point in points if point is not None]
+        rows = iter(self.query(located, k=k))
+        picks = []
+        taken = set()
+        for point in points:
+            if point is None:
+                picks.append(None)
+                continue
+            row = [int(index) for index in next(rows)]
+            choice = next((index for index in row if index not in used), None)
+            if choice is None:
+                choice = next((index for index in row if index not in taken), row[0])
+            used.add(choice)
+            taken.add(choice)
+            picks.append(self.items[choice])
+        return picks
@@ -0,0 +1,96 @@
+# disk_cache.py
+# SQLite-backed key/value cache shared between agent processes.
+import json
+import os
+import sqlite3
+import time
+
+
+class DiskCache:
+    """JSON values with a per-entry TTL and least-recently-used eviction."""
+
+    def __init__(self, path, max_entries=5000):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+
+    def _connect(self):
+        # One short-lived connection per operation keeps the cache safe to use
+        # from worker threads and from several agent processes at once.
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key, default=None):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return default
+                if row[1] <= now:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    return default
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            print(f" [DiskCache] Read failed for {key}: {e}")
+            return default
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now + ttl, now),
+                )
+                self._evict(conn, now)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f" [DiskCache] Write failed for {key}: {e}")
+
+    def expires_in(self, key):
+        """Seconds until the entry expires, or None when it is absent."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        return row[0] - time.time()
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+
+    def purge_expired(self):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        overflow = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
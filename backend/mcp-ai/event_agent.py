@@ -3,8 +3,15 @@
 import os
 import json
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 import requests
+from requests.adapters import HTTPAdapter
 import cohere
+import metrics
+from circuit_breaker import CircuitOpenError, get_breaker
+from event_cache import EventCache
+from image_cache import ImageCache
 
 # --- IMPORTANT ---
 # You must set your Cohere API key as an environment variable.
@@ -14,6 +21,19 @@ import cohere
 COHERE_API_KEY = os.environ.get("COHERE_API_KEY", "TDqJle6hLi86L7AYbarwkVMpJrPGMpziV8FlI2AX")
 UNSPLASH_ACCESS_KEY = os.environ.get("UNSPLASH_ACCESS_KEY", "BDC_IfRT8fqFvRJyx4xjNjzndSVs6P1q45FQqBxa3xA")
 
+COHERE_MODEL = os.environ.get("COHERE_MODEL", "command")
+# Bump whenever the event prompt or its parsing changes, so cached answers to
+# the old prompt are not served.
+EVENT_PROMPT_VERSION = "1"
+
+# Cities asked of Cohere at once, and Unsplash lookups in flight per agent.
+EVENT_CITY_WORKERS = int(os.environ.get("EVENT_AGENT_MAX_WORKERS", "4"))
+EVENT_IMAGE_WORKERS = int(os.environ.get("EVENT_AGENT_IMAGE_WORKERS", "8"))
+# Seconds a whole trip may spend on events before the remaining cities get fallback events.
+EVENT_TRIP_DEADLINE = float(os.environ.get("EVENT_AGENT_TRIP_DEADLINE", "45"))
+# Ask for every city of a trip in one prompt instead of one prompt per city.
+EVENT_BATCH_PROMPT = os.environ.get("EVENT_AGENT_BATCH_PROMPT", "1") != "0"
+
 class EventAgent:
     def __init__(self):
         if COHERE_API_KEY == "YOUR_COHERE_API_KEY_HERE":
@@ -21,19 +41,67 @@ class EventAgent:
             self.client = None
         else:
             self.client = cohere.Client(COHERE_API_KEY)
+        # One keep-alive session for every Unsplash lookup, sized for the image workers.
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=EVENT_IMAGE_WORKERS))
+        self.image_pool = ThreadPoolExecutor(max_workers=EVENT_IMAGE_WORKERS)
+        self.event_cache = EventCache() if os.environ.get("EVENT_CACHE_ENABLED", "1") != "0" else None
+        self.image_cache = ImageCache() if os.environ.get("IMAGE_CACHE_ENABLED", "1") != "0" else None
+
+    def close(self):
+        self.image_pool.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def placeholder_image_url(self, keywords="event"):
+        return f"https://source.unsplash.com/random/800x600/?{requests.utils.quote(keywords)}"
+
+    def local_image_url(self, keywords="event", category=None, city=None):
+        """An image from the local pool, or a placeholder; never calls out."""
+        pooled = self.image_cache.pool_image(city, category, seed=keywords) if self.image_cache else None
+        return pooled or self.placeholder_image_url(keywords)
+
+    def attach_images(self, events, cities):
+        """Sets `imageUrl` on every event, `cities[i]` being the city of `events[i]`.
+
+        Cached keywords are answered locally; the rest go to Unsplash at once.
+        """
+        lookups = []
+        for event, city in zip(events, cities):
+            keywords = f"{event['title']} {city} {event.get('category', '')}".strip()
+            cached = self.image_cache.get_url(keywords) if self.image_cache else None
+            if cached:
+                event['imageUrl'] = cached
+            else:
+                lookups.append((event, keywords, city))
+        metrics.inc('event_image_cache_total', len(events) - len(lookups), outcome='hit')
+        metrics.inc('event_image_cache_total', len(lookups), outcome='miss')
+        urls = self.image_pool.map(lambda lookup: self.get_event_image_url(lookup[1], lookup[0].get('category'), lookup[2]), lookups)
+        for (event, _, _), url in zip(lookups, urls):
+            event['imageUrl'] = url
+        return events
 
-    def get_event_image_url(self, keywords="event"):
+    def _unsplash_get(self, url):
+        response = self.session.get(url, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    def get_event_image_url(self, keywords="event", category=None, city=None):
         if not UNSPLASH_ACCESS_KEY:
             return "https://placehold.co/800x600/grey/white?text=Image"
         try:
             url = f"https://api.unsplash.com/photos/random?query={requests.utils.quote(keywords)}&client_id={UNSPLASH_ACCESS_KEY}"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            return data.get('urls', {}).get('regular', "https://source.unsplash.com/random/800x600/?event")
+            data = get_breaker('unsplash').call(self._unsplash_get, url)
+            image_url = data.get('urls', {}).get('regular')
+            if not image_url:
+                return self.local_image_url(keywords, category, city)
+            if self.image_cache:
+                self.image_cache.set_url(keywords, image_url)
+            return image_url
+        except CircuitOpenError:
+            return self.local_image_url(keywords, category, city)
         except Exception as e:
             print(f" [EventAgent] Unsplash Error: {e}")
-            return f"https://source.unsplash.com/random/800x600/?{requests.utils.quote(keywords)}"
+            return self.local_image_url(keywords, category, city)
 
     def get_fallback_events(self, city):
         events = [
@@ -41,14 +109,163 @@ class EventAgent:
             {"title": "Artisan Food Market", "date": "This Weekend", "location": f"{city} Town Square", "description": "Taste and buy local delicacies.", "category": "food"},
             {"title": "Indie Art Showcase", "date": "Next Week", "location": f"{city} Cultural Hall", "description": "Discover emerging visual artists from the region.", "category": "art"},
         ]
+        # Placeholder data only ever uses local images.
         for event in events:
-            event['imageUrl'] = self.get_event_image_url(f"{event['title']} {city}")
+            event['imageUrl'] = self.local_image_url(f"{event['title']} {city}", event['category'], city)
         return events
 
+    def get_events_for_cities(self, cities, deadline=EVENT_TRIP_DEADLINE):
+        """Events for every city, generated concurrently.
+
+        With several cities, one batched prompt covers them all first and only
+        the cities it got wrong are asked about individually. Cities still
+        pending when `deadline` seconds have passed get fallback events, so a
+        slow upstream cannot stall the trip.
+        """
+        cities = list(dict.fromkeys(cities))
+        if not cities:
+            return {}
+        started = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=max(1, min(EVENT_CITY_WORKERS, len(cities))))
+        try:
+            events_by_city = {}
+            if self.client and EVENT_BATCH_PROMPT and len(cities) > 1:
+                batch = pool.submit(self.get_events_batched, cities)
+                if wait([batch], timeout=deadline).done:
+                    events_by_city.update(batch.result())
+            retry = [city for city in cities if city not in events_by_city]
+            if events_by_city and retry:
+                print(f" [EventAgent] Re-querying events for {', '.join(retry)}")
+            remaining = max(0.0, deadline - (time.monotonic() - started))
+            futures = {pool.submit(self.get_events, city): city for city in retry}
+            done, _ = wait(futures, timeout=remaining)
+            for future, city in futures.items():
+                if future in done:
+                    events_by_city[city] = future.result()
+                else:
+                    print(f" [EventAgent] Event deadline passed for {city}; using fallback events.")
+                    metrics.inc('event_deadline_fallbacks_total')
+                    events_by_city[city] = self.get_fallback_events(city)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        metrics.observe('event_trip_seconds', time.monotonic() - started, cities=len(cities))
+        return {city: events_by_city[city] for city in cities}
+
+    def _cached_events(self, city):
+        if not self.event_cache:
+            return None
+        cached = self.event_cache.get_events(city, COHERE_MODEL, EVENT_PROMPT_VERSION)
+        metrics.inc('event_cache_total', outcome='hit' if cached else 'miss')
+        return cached
+
+    def _clean_events(self, parsed_events, city):
+        """Well-formed events from one city's parsed LLM output, at most three."""
+        cleaned_events = []
+        for event in parsed_events:
+            if not isinstance(event, dict):
+                continue
+            title = event.get('title')
+            if not title:
+                continue
+            cleaned_events.append({
+                'title': title,
+                'date': event.get('date', 'Upcoming'),
+                'location': event.get('location', city),
+                'description': event.get('description', ''),
+                'category': event.get('category', 'festival'),
+            })
+        return cleaned_events[:3]
+
+    def _complete_events(self, cleaned_events, city):
+        """Caches a complete answer, or tops a short one up with fallback events."""
+        # Only complete answers are cached; topped-up lists get another try next time.
+        if self.event_cache and len(cleaned_events) == 3:
+            self.event_cache.set_events(city, COHERE_MODEL, EVENT_PROMPT_VERSION, cleaned_events)
+
+        if len(cleaned_events) < 3:
+            fallback_events = self.get_fallback_events(city)
+            existing_titles = {event['title'].lower() for event in cleaned_events}
+            for fallback in fallback_events:
+                if fallback['title'].lower() in existing_titles:
+                    continue
+                cleaned_events.append(fallback)
+                existing_titles.add(fallback['title'].lower())
+                if len(cleaned_events) >= 3:
+                    break
+
+        return cleaned_events if cleaned_events else self.get_fallback_events(city)
+
+    def get_events_batched(self, cities):
+        """Events for several cities from one Cohere call.
+
+        Returns only the cities answered from the cache or by a well-formed
+        section of the response; callers re-query the rest.
+        """
+        results = {}
+        misses = []
+        for city in cities:
+            cached = self._cached_events(city)
+            if cached:
+                results[city] = cached
+            else:
+                misses.append(city)
+        if len(misses) < 2:
+            return results
+
+        prompt = f"""
+        Generate 3 unique and plausible upcoming events in each of these cities for the next two weeks: {json.dumps(misses)}.
+        Format the response as a single valid JSON object whose keys are exactly those city names,
+        each mapping to an array of objects with these exact property names:
+        {{
+          "City Name": [
+            {{
+              "title": "Event Title",
+              "date": "YYYY-MM-DD",
+              "location": "Venue Name, Area",
+              "description": "A brief, engaging description of the event.",
+              "category": "music, art, food, sports, or festival"
+            }}
+          ]
+        }}
+        """
+        try:
+            response = get_breaker('cohere').call(self.client.chat, model=COHERE_MODEL, message=prompt, temperature=0.6)
+            json_text = re.search(r'\{.*\}', response.text, re.DOTALL)
+            parsed = json.loads(json_text.group(0)) if json_text else None
+            if not isinstance(parsed, dict):
+                print(" [EventAgent] Batched Cohere response did not contain a JSON object.")
+                return results
+        except CircuitOpenError:
+            return results
+        except Exception as e:
+            print(f" [EventAgent] Batched Cohere API Error: {e}")
+            return results
+
+        sections = {' '.join(str(key).lower().split()): value for key, value in parsed.items()}
+        answered = {}
+        for city in misses:
+            section = sections.get(' '.join(city.lower().split()))
+            cleaned_events = self._clean_events(section, city) if isinstance(section, list) else []
+            if cleaned_events:
+                answered[city] = cleaned_events
+            else:
+                metrics.inc('event_batch_rejected_sections_total')
+
+        # Every image for the batch in one go.
+        all_events = [(city, event) for city, events in answered.items() for event in events]
+        self.attach_images([event for _, event in all_events], [city for city, _ in all_events])
+        for city, cleaned_events in answered.items():
+            results[city] = self._complete_events(cleaned_events, city)
+        return results
+
     def get_events(self, city):
         if not self.client:
             return self.get_fallback_events(city)
 
+        cached = self._cached_events(city)
+        if cached:
+            return cached
+
         prompt = f"""
         Generate 3 unique and plausible upcoming events in {city} for the next two weeks.
         Format the response as a valid JSON array of objects with these exact property names:
@@ -63,7 +280,7 @@ class EventAgent:
         ]
         """
         try:
-            response = self.client.chat(model="command", message=prompt, temperature=0.6)
+            response = get_breaker('cohere').call(self.client.chat, model=COHERE_MODEL, message=prompt, temperature=0.6)
             json_text = re.search(r'\[.*\]', response.text, re.DOTALL)
 
             if not json_text:
@@ -74,38 +291,11 @@ class EventAgent:
             if not isinstance(parsed_events, list):
                 raise ValueError('Parsed events payload is not a list')
 
-            cleaned_events = []
-            for event in parsed_events:
-                if not isinstance(event, dict):
-                    continue
-                title = event.get('title')
-                if not title:
-                    continue
-                cleaned = {
-                    'title': title,
-                    'date': event.get('date', 'Upcoming'),
-                    'location': event.get('location', city),
-                    'description': event.get('description', ''),
-                    'category': event.get('category', 'festival'),
-                }
-                cleaned['imageUrl'] = self.get_event_image_url(f"{cleaned['title']} {city} {cleaned['category']}")
-                cleaned_events.append(cleaned)
-
-            if len(cleaned_events) < 3:
-                fallback_events = self.get_fallback_events(city)
-                existing_titles = {event['title'].lower() for event in cleaned_events}
-                for fallback in fallback_events:
-                    if fallback['title'].lower() in existing_titles:
-                        continue
-                    cleaned_events.append(fallback)
-                    existing_titles.add(fallback['title'].lower())
-                    if len(cleaned_events) >= 3:
-                        break
-
-            if len(cleaned_events) > 3:
-                cleaned_events = cleaned_events[:3]
-
-            return cleaned_events if cleaned_events else self.get_fallback_events(city)
+            cleaned_events = self._clean_events(parsed_events, city)
+            self.attach_images(cleaned_events, [city] * len(cleaned_events))
+            return self._complete_events(cleaned_events, city)
+        except CircuitOpenError:
+            return self.get_fallback_events(city)
         except Exception as e:
             print(f" [EventAgent] Cohere API Error: {e}")
             return self.get_fallback_events(city)
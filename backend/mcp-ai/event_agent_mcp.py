@@ -3,6 +3,7 @@
 import pika
 import json
 import time
+import metrics
 from event_agent import EventAgent
 
 def on_request(ch, method, props, body):
@@ -16,10 +17,11 @@ def on_request(ch, method, props, body):
         try:
             event_agent = EventAgent()
             cities = payload.get("cities", [])
-            events_by_city = {}
-            for city in cities:
-                print(f" [EventAgent] Finding events for {city}...")
-                events_by_city[city] = event_agent.get_events(city)
+            print(f" [EventAgent] Finding events for {', '.join(cities)}...")
+            try:
+                events_by_city = event_agent.get_events_for_cities(cities)
+            finally:
+                event_agent.close()
 
             response_message = {
                 "trip_id": trip_id, "intent": "EventsFound", "payload": {"events_by_city": events_by_city}
@@ -28,7 +30,7 @@ def on_request(ch, method, props, body):
             print(f" [EventAgent] Sent events for trip '{trip_id}' back to orchestrator.")
         except Exception as e:
             print(f" [EventAgent] Error finding events: {e}")
-            
+    metrics.dump('event_agent')
     ch.basic_ack(delivery_tag=method.delivery_tag)
 
 def start_agent():
@@ -0,0 +1,62 @@
+# event_cache.py
+# Persistent cache of LLM-generated event lists. The prompt asks for events
+# "for the next two weeks", so an answer stays valid for the rest of its
+# two-week window and is shared by every trip to the same city.
+#
+#   python event_cache.py stats
+#   python event_cache.py purge
+import argparse
+import os
+from datetime import date
+
+from disk_cache import DiskCache
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'event_cache.sqlite3')
+DEFAULT_TTL_HOURS = 24
+WINDOW_DAYS = 14
+
+
+def window_index(today=None):
+    """Two-week window the given day falls in; keys roll over at its end."""
+    return (today or date.today()).toordinal() // WINDOW_DAYS
+
+
+class EventCache:
+    """Parsed event lists keyed by (city, two-week window, model, prompt version)."""
+
+    def __init__(self, path=None, max_entries=None, ttl_hours=None):
+        self.cache = DiskCache(
+            path or os.environ.get("EVENT_CACHE_PATH", DEFAULT_CACHE_PATH),
+            max_entries=max_entries or int(os.environ.get("EVENT_CACHE_MAX_ENTRIES", "2000")),
+        )
+        hours = ttl_hours if ttl_hours is not None else os.environ.get("EVENT_CACHE_TTL_HOURS", DEFAULT_TTL_HOURS)
+        self.ttl = float(hours) * 3600
+
+    @staticmethod
+    def _key(city, model, prompt_version, window=None):
+        window = window_index() if window is None else window
+        return f"events:{prompt_version}:{model}:{window}:{' '.join(str(city).lower().split())}"
+
+    def get_events(self, city, model, prompt_version):
+        return self.cache.get(self._key(city, model, prompt_version))
+
+    def set_events(self, city, model, prompt_version, events):
+        self.cache.set(self._key(city, model, prompt_version), events, self.ttl)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the on-disk event cache.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='Show the number of cached entries')
+    subparsers.add_parser('purge', help='Drop expired entries')
+
+    args = parser.parse_args()
+    cache = EventCache()
+    if args.command == 'stats':
+        print(f" [EventCache] {len(cache.cache)} entries in {cache.cache.path}")
+    elif args.command == 'purge':
+        print(f" [EventCache] Removed {cache.cache.purge_expired()} expired entries")
+
+
+if __name__ == '__main__':
+    main()
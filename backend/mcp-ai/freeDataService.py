@@ -3,48 +3,143 @@
 # This is the Python equivalent of the freeDataService.js you provided.
 import requests
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+import rate_limiter
+from overpass_pool import get_pool
+from poi_cache import POICache
+from poi_store import POIStore
+
+# Overpass filters, search radius (metres), result limit and server-side timeout
+# for every POI category the itinerary needs.
+POI_CATEGORIES = {
+    'attractions': {
+        'filters': ['node["tourism"~"attraction|museum|viewpoint"]', 'node["historic"]', 'node["leisure"~"park|garden"]'],
+        'radius': 5000,
+        'limit': 20,
+        'timeout': 30,
+    },
+    'restaurants': {
+        'filters': ['node["amenity"="restaurant"]', 'node["amenity"="cafe"]'],
+        'radius': 3000,
+        'limit': 15,
+        'timeout': 20,
+    },
+    'hotels': {
+        'filters': ['node["tourism"="hotel"]', 'node["tourism"="guest_house"]'],
+        'radius': 5000,
+        'limit': 10,
+        'timeout': 20,
+    },
+}
+
+# Element type emitted by `make` between categories of a combined query.
+SECTION_MARKER = 'section'
+
+# Cities per Overpass request in route-wide batches; keeps each query well under
+# the server's memory and time limits.
+OVERPASS_BATCH_MAX_CITIES = int(os.environ.get("OVERPASS_BATCH_MAX_CITIES", "6"))
+OVERPASS_MAX_TIMEOUT = 120
 
 class FreeDataService:
-    def __init__(self):
+    def __init__(self, priority=rate_limiter.PRIORITY_INTERACTIVE):
+        # Queue position for Nominatim/Overpass requests; cache warming runs in the background.
+        self.priority = priority
         self.nominatim_base_url = 'https://nominatim.openstreetmap.org'
-        self.overpass_base_url = 'https://overpass-api.de/api/interpreter'
         self.weather_api_key = os.environ.get("OPENWEATHER_API_KEY", "144f40803196f5205a5d86fa652a4720")
+        self.poi_cache = POICache() if os.environ.get("POI_CACHE_ENABLED", "1") != "0" else None
+        self.poi_store = POIStore.from_env()
 
     def get_coordinates(self, destination):
+        if self.poi_cache:
+            cached = self.poi_cache.get_coordinates(destination)
+            if cached:
+                return cached
         try:
-            response = requests.get(f"{self.nominatim_base_url}/search", params={'q': destination, 'format': 'json', 'limit': 1}, headers={'User-Agent': 'TravelApp/1.0'})
+            rate_limiter.acquire(self.nominatim_base_url, self.priority)
+            with rate_limiter.host_slot(self.nominatim_base_url, self.priority):
+                response = requests.get(f"{self.nominatim_base_url}/search", params={'q': destination, 'format': 'json', 'limit': 1}, headers={'User-Agent': 'TravelApp/1.0'})
             response.raise_for_status()
             data = response.json()
             if data:
-                return {'lat': float(data[0]['lat']), 'lon': float(data[0]['lon'])}
+                coords = {'lat': float(data[0]['lat']), 'lon': float(data[0]['lon'])}
+                if self.poi_cache:
+                    self.poi_cache.set_coordinates(destination, coords)
+                return coords
             raise ValueError("No results found")
         except Exception as e:
             print(f"Error getting coordinates for {destination}: {e}")
             return None
 
+    def _post_overpass(self, query, timeout=30):
+        return get_pool().post(query, timeout=timeout, priority=self.priority)
+
     def query_overpass(self, query):
         try:
-            response = requests.post(self.overpass_base_url, data=query, headers={'User-Agent': 'TravelApp/1.0'}, timeout=30)
-            response.raise_for_status()
-            return response.json().get('elements', [])
+            return self._post_overpass(query)
         except Exception as e:
             print(f"Overpass API error: {e}")
             return []
 
-    def get_attractions(self, destination):
-        coords = self.get_coordinates(destination)
-        if not coords: return []
-        lat, lon = coords['lat'], coords['lon']
-        query = f"""
-        [out:json][timeout:30];
-        (
-          node["tourism"~"attraction|museum|viewpoint"](around:5000,{lat},{lon});
-          node["historic"](around:5000,{lat},{lon});
-          node["leisure"~"park|garden"](around:5000,{lat},{lon});
-        );
-        out body 20;
-        """
-        elements = self.query_overpass(query)
+    def _category_block(self, category, lat, lon):
+        spec = POI_CATEGORIES[category]
+        radius = spec['radius']
+        statements = '\n'.join(f"  {selector}(around:{radius},{lat},{lon});" for selector in spec['filters'])
+        return f"(\n{statements}\n);\nout body {spec['limit']};"
+
+    def build_category_query(self, category, lat, lon):
+        timeout = POI_CATEGORIES[category]['timeout']
+        return f"[out:json][timeout:{timeout}];\n{self._category_block(category, lat, lon)}\n"
+
+    def build_bundle_query(self, lat, lon, categories=None):
+        """Union query returning every category, each preceded by a section marker."""
+        categories = list(categories or POI_CATEGORIES)
+        timeout = max(POI_CATEGORIES[category]['timeout'] for category in categories)
+        blocks = [
+            f'make {SECTION_MARKER} category="{category}";\nout;\n{self._category_block(category, lat, lon)}'
+            for category in categories
+        ]
+        return f"[out:json][timeout:{timeout}];\n" + '\n'.join(blocks) + '\n'
+
+    def build_route_query(self, requests_by_city):
+        """One query for several cities; `requests_by_city` maps a marker id to ((lat, lon), categories)."""
+        blocks = []
+        timeout = 0
+        for city_id, ((lat, lon), categories) in requests_by_city.items():
+            for category in categories:
+                timeout = max(timeout, POI_CATEGORIES[category]['timeout'])
+                blocks.append(
+                    f'make {SECTION_MARKER} city="{city_id}", category="{category}";\nout;\n'
+                    f'{self._category_block(category, lat, lon)}'
+                )
+        # Give the server a little more time per extra city, within its usual ceiling.
+        timeout = min(OVERPASS_MAX_TIMEOUT, timeout + 10 * (len(requests_by_city) - 1))
+        return f"[out:json][timeout:{timeout}];\n" + '\n'.join(blocks) + '\n', timeout
+
+    @staticmethod
+    def _split_by_marker(elements, key_for):
+        sections = {}
+        current = None
+        for el in elements:
+            if el.get('type') == SECTION_MARKER:
+                current = key_for(el.get('tags', {}))
+                sections.setdefault(current, [])
+                continue
+            if current is not None:
+                sections[current].append(el)
+        return sections
+
+    @classmethod
+    def split_sections(cls, elements):
+        """Groups a combined query's elements by the section marker preceding them."""
+        return cls._split_by_marker(elements, lambda tags: tags.get('category'))
+
+    @classmethod
+    def split_route_sections(cls, elements):
+        """Like split_sections, keyed by (city marker id, category)."""
+        return cls._split_by_marker(elements, lambda tags: (tags.get('city'), tags.get('category')))
+
+    def _format_attractions(self, elements):
         return [
             {
                 'name': el['tags'].get('name', 'Unknown Attraction'),
@@ -54,19 +149,7 @@ class FreeDataService:
             for el in elements if 'name' in el.get('tags', {})
         ]
 
-    def get_restaurants(self, destination):
-        coords = self.get_coordinates(destination)
-        if not coords: return []
-        lat, lon = coords['lat'], coords['lon']
-        query = f"""
-        [out:json][timeout:20];
-        (
-          node["amenity"="restaurant"](around:3000,{lat},{lon});
-          node["amenity"="cafe"](around:3000,{lat},{lon});
-        );
-        out body 15;
-        """
-        elements = self.query_overpass(query)
+    def _format_restaurants(self, elements):
         return [
             {
                 'name': el['tags'].get('name', 'Local Eatery'),
@@ -77,19 +160,7 @@ class FreeDataService:
             for el in elements if 'name' in el.get('tags', {})
         ]
 
-    def get_hotels(self, destination):
-        coords = self.get_coordinates(destination)
-        if not coords: return []
-        lat, lon = coords['lat'], coords['lon']
-        query = f"""
-        [out:json][timeout:20];
-        (
-          node["tourism"="hotel"](around:5000,{lat},{lon});
-          node["tourism"="guest_house"](around:5000,{lat},{lon});
-        );
-        out body 10;
-        """
-        elements = self.query_overpass(query)
+    def _format_hotels(self, elements, destination):
         return [
             {
                 'name': el['tags'].get('name', f'{destination} Hotel'),
@@ -98,3 +169,146 @@ class FreeDataService:
             }
             for el in elements if 'name' in el.get('tags', {})
         ]
+
+    def format_category(self, category, elements, destination):
+        if category == 'attractions':
+            return self._format_attractions(elements)
+        if category == 'restaurants':
+            return self._format_restaurants(elements)
+        return self._format_hotels(elements, destination)
+
+    def _local_pois(self, category, coords, destination):
+        """POIs from the offline store or the cache, or None when the network is needed."""
+        spec = POI_CATEGORIES[category]
+        if self.poi_store and self.poi_store.covers(coords['lat'], coords['lon']):
+            try:
+                elements = self.poi_store.query_around(category, coords['lat'], coords['lon'], spec['radius'], spec['limit'])
+                if elements:
+                    return self.format_category(category, elements, destination)
+                # Inside the extract's bounding box but possibly outside its data
+                # (e.g. a neighbouring country); let the cache or Overpass answer.
+                print(f" [POIStore] No {category} near {destination} in the offline store, falling back")
+            except Exception as e:
+                print(f" [POIStore] Lookup failed, falling back to Overpass: {e}")
+        if not self.poi_cache:
+            return None
+        return self.poi_cache.get_pois(category, coords['lat'], coords['lon'], spec['radius'])
+
+    def _store_pois(self, category, coords, pois):
+        if self.poi_cache:
+            self.poi_cache.set_pois(category, coords['lat'], coords['lon'], POI_CATEGORIES[category]['radius'], pois)
+
+    def _get_category(self, category, destination):
+        coords = self.get_coordinates(destination)
+        if not coords: return []
+        local = self._local_pois(category, coords, destination)
+        if local is not None:
+            return local
+        try:
+            elements = self._post_overpass(self.build_category_query(category, coords['lat'], coords['lon']))
+        except Exception as e:
+            print(f"Overpass API error: {e}")
+            return []
+        pois = self.format_category(category, elements, destination)
+        self._store_pois(category, coords, pois)
+        return pois
+
+    def get_attractions(self, destination):
+        return self._get_category('attractions', destination)
+
+    def get_restaurants(self, destination):
+        return self._get_category('restaurants', destination)
+
+    def get_hotels(self, destination):
+        return self._get_category('hotels', destination)
+
+    def get_city_bundle(self, destination):
+        """Attractions, restaurants and hotels for a city from one geocode and one Overpass call."""
+        bundle = {'coordinates': None, **{category: [] for category in POI_CATEGORIES}}
+        coords = self.get_coordinates(destination)
+        if not coords:
+            return bundle
+        bundle['coordinates'] = coords
+
+        missing = []
+        for category in POI_CATEGORIES:
+            local = self._local_pois(category, coords, destination)
+            if local is None:
+                missing.append(category)
+            else:
+                bundle[category] = local
+        if not missing:
+            return bundle
+
+        try:
+            elements = self._post_overpass(self.build_bundle_query(coords['lat'], coords['lon'], missing))
+        except Exception as e:
+            print(f"Overpass API error: {e}")
+            return bundle
+        sections = self.split_sections(elements)
+        for category in missing:
+            if category not in sections:
+                # No marker means the response was cut short; don't cache a false empty.
+                continue
+            bundle[category] = self.format_category(category, sections[category], destination)
+            self._store_pois(category, coords, bundle[category])
+        return bundle
+
+    def _fetch_route_chunk(self, chunk, destinations, coordinates, bundles):
+        query, timeout = self.build_route_query({
+            city_id: ((coordinates[city_id]['lat'], coordinates[city_id]['lon']), categories)
+            for city_id, categories in chunk.items()
+        })
+        try:
+            elements = self._post_overpass(query, timeout=timeout + 10)
+        except Exception as e:
+            print(f"Overpass API error: {e}")
+            return
+        sections = self.split_route_sections(elements)
+        for city_id, categories in chunk.items():
+            destination = destinations[int(city_id)]
+            for category in categories:
+                if (city_id, category) not in sections:
+                    continue
+                pois = self.format_category(category, sections[(city_id, category)], destination)
+                bundles[destination][category] = pois
+                self._store_pois(category, coordinates[city_id], pois)
+
+    def get_route_bundles(self, destinations, max_workers=4):
+        """City bundles for a whole route, fetching every uncached (city, category) in batched Overpass calls."""
+        destinations = list(dict.fromkeys(destinations))
+        bundles = {destination: {'coordinates': None, **{category: [] for category in POI_CATEGORIES}} for destination in destinations}
+        if not destinations:
+            return bundles
+
+        workers = max(1, min(max_workers, len(destinations)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            geocoded = list(pool.map(self.get_coordinates, destinations))
+
+        coordinates = {}
+        missing = {}
+        for index, (destination, coords) in enumerate(zip(destinations, geocoded)):
+            if not coords:
+                continue
+            city_id = str(index)
+            coordinates[city_id] = coords
+            bundles[destination]['coordinates'] = coords
+            for category in POI_CATEGORIES:
+                local = self._local_pois(category, coords, destination)
+                if local is None:
+                    missing.setdefault(city_id, []).append(category)
+                else:
+                    bundles[destination][category] = local
+        if not missing:
+            return bundles
+
+        city_ids = list(missing)
+        chunks = [
+            {city_id: missing[city_id] for city_id in city_ids[start:start + OVERPASS_BATCH_MAX_CITIES]}
+            for start in range(0, len(city_ids), OVERPASS_BATCH_MAX_CITIES)
+        ]
+        print(f" [FreeDataService] Fetching {len(city_ids)} cities in {len(chunks)} Overpass request(s)")
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+            for future in [pool.submit(self._fetch_route_chunk, chunk, destinations, coordinates, bundles) for chunk in chunks]:
+                future.result()
+        return bundles
@@ -0,0 +1,119 @@
+# hedging.py
+# Rolling latency tracking and hedged calls: when the first attempt is slower
+# than its usual p90, a duplicate goes out and whichever succeeds first wins.
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class LatencyTracker:
+    """Latencies and outcomes of the last `window` calls to one upstream."""
+
+    def __init__(self, window=50):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            self._outcomes.append(True)
+
+    def record_error(self):
+        with self._lock:
+            self._outcomes.append(False)
+
+    @property
+    def samples(self):
+        with self._lock:
+            return len(self._latencies)
+
+    def percentile(self, fraction, default=None):
+        with self._lock:
+            ordered = sorted(self._latencies)
+        if not ordered:
+            return default
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+    def error_rate(self):
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return self._outcomes.count(False) / len(self._outcomes)
+
+
+class HedgeBudget:
+    """Caps hedged requests at `ratio` of all requests (0.1 = at most 10% extra
+    load), so hedging cannot multiply traffic to an upstream that is already
+    struggling. Unused allowance accumulates up to `burst` hedges."""
+
+    def __init__(self, ratio, burst=5):
+        self.ratio = max(0.0, float(ratio))
+        self.burst = max(1.0, float(burst))
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+
+    def record_request(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+def run_hedged(calls, hedge_after, cancels=None, should_hedge=None, max_hedges=None, failover=True):
+    """Runs calls[0], starting the next call whenever the current ones are slower
+    than `hedge_after` seconds or, with `failover`, have all failed.
+
+    Returns (index, result) of the first call to succeed. Calls still running
+    at that point get their entry in `cancels` invoked. `should_hedge` is asked
+    before a duplicate is sent because of slowness (not after a failure); when
+    it returns False the call carries on unhedged. Raises the last error when
+    every call fails. At most `max_hedges` calls start because of slowness;
+    the rest are only used for failover.
+    """
+    cancels = cancels or [None] * len(calls)
+    pool = ThreadPoolExecutor(max_workers=len(calls))
+    futures = {}
+    last_error = None
+    try:
+        futures[pool.submit(calls[0])] = 0
+        next_index = 1
+        hedges_left = len(calls) - 1 if max_hedges is None else max_hedges
+        hedging = True
+        while futures:
+            deadline = hedge_after if hedging and hedges_left > 0 and next_index < len(calls) else None
+            done, _ = wait(list(futures), timeout=deadline, return_when=FIRST_COMPLETED)
+            if not done:
+                if should_hedge is None or should_hedge():
+                    futures[pool.submit(calls[next_index])] = next_index
+                    next_index += 1
+                    hedges_left -= 1
+                else:
+                    # Hedge refused: wait on what is already running.
+                    hedging = False
+                continue
+            for future in done:
+                index = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                for loser, loser_index in futures.items():
+                    loser.cancel()
+                    if cancels[loser_index]:
+                        cancels[loser_index]()
+                return index, result
+            if not futures and failover and next_index < len(calls):
+                # Everything in flight failed: fail over immediately.
+                futures[pool.submit(calls[next_index])] = next_index
+                next_index += 1
+        raise last_error if last_error else RuntimeError("No hedged call completed")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
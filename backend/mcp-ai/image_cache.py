@@ -0,0 +1,127 @@
+# image_cache.py
+# Local Unsplash image URLs for event cards: a keyword -> URL cache for real
+# events, and a pool of photos per event category and per city that fallback
+# events draw from without any network call. Build the pool ahead of time:
+#
+#   python image_cache.py build           # every category plus gazetteer cities
+#   python image_cache.py build --limit 20 --per-query 10
+#   python image_cache.py stats
+#   python image_cache.py purge
+import argparse
+import os
+import time
+import zlib
+
+from disk_cache import DiskCache
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'image_cache.sqlite3')
+EVENT_CATEGORIES = ['music', 'art', 'food', 'sports', 'festival']
+KEYWORD_TTL_DAYS = 30
+POOL_TTL_DAYS = 180
+
+
+def _days(value):
+    return float(value) * 24 * 3600
+
+
+def _normalise(text):
+    return ' '.join(str(text).lower().split())
+
+
+class ImageCache:
+    """Image URLs keyed by search keywords, plus per-category and per-city pools."""
+
+    def __init__(self, path=None, max_entries=None):
+        self.cache = DiskCache(
+            path or os.environ.get("IMAGE_CACHE_PATH", DEFAULT_CACHE_PATH),
+            max_entries=max_entries or int(os.environ.get("IMAGE_CACHE_MAX_ENTRIES", "20000")),
+        )
+
+    def get_url(self, keywords):
+        return self.cache.get(f"url:{_normalise(keywords)}")
+
+    def set_url(self, keywords, url):
+        ttl = _days(os.environ.get("IMAGE_CACHE_TTL_DAYS", KEYWORD_TTL_DAYS))
+        self.cache.set(f"url:{_normalise(keywords)}", url, ttl)
+
+    def get_pool(self, kind, name):
+        return self.cache.get(f"pool:{kind}:{_normalise(name)}") or []
+
+    def set_pool(self, kind, name, urls):
+        self.cache.set(f"pool:{kind}:{_normalise(name)}", list(urls), _days(POOL_TTL_DAYS))
+
+    def pool_image(self, city=None, category=None, seed=''):
+        """A pooled photo for the city, else for the category, or None.
+
+        `seed` picks the photo, so the same event always gets the same image.
+        """
+        for kind, name in (('city', city), ('category', category)):
+            if not name:
+                continue
+            urls = self.get_pool(kind, name)
+            if urls:
+                return urls[zlib.crc32(_normalise(seed).encode('utf-8')) % len(urls)]
+        return None
+
+
+def _search_unsplash(session, query, count):
+    import rate_limiter
+    from event_agent import UNSPLASH_ACCESS_KEY
+
+    url = 'https://api.unsplash.com/photos/random'
+    rate_limiter.acquire(url, rate_limiter.PRIORITY_BACKGROUND)
+    response = session.get(url, params={'query': query, 'count': count, 'client_id': UNSPLASH_ACCESS_KEY}, timeout=15)
+    response.raise_for_status()
+    return [photo['urls']['regular'] for photo in response.json() if photo.get('urls', {}).get('regular')]
+
+
+def build(limit=None, per_query=10, delay=0.0, skip_existing=True):
+    import requests
+    from map_agent import MapAgent
+
+    cache = ImageCache()
+    session = requests.Session()
+    targets = [('category', category, f"{category} event") for category in EVENT_CATEGORIES]
+    cities = MapAgent.MAJOR_CITIES[:limit] if limit else MapAgent.MAJOR_CITIES
+    targets += [('city', city['name'], f"{city['name']} city") for city in cities]
+
+    for index, (kind, name, query) in enumerate(targets, start=1):
+        if skip_existing and cache.get_pool(kind, name):
+            print(f" [ImageCache] ({index}/{len(targets)}) {kind} {name}: already pooled")
+            continue
+        try:
+            urls = _search_unsplash(session, query, per_query)
+        except Exception as e:
+            print(f" [ImageCache] ({index}/{len(targets)}) {kind} {name}: Unsplash Error: {e}")
+            continue
+        cache.set_pool(kind, name, urls)
+        print(f" [ImageCache] ({index}/{len(targets)}) {kind} {name}: {len(urls)} images")
+        if delay:
+            time.sleep(delay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the on-disk event image cache and image pool.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Fill the per-category and per-city image pools from Unsplash')
+    build_parser.add_argument('--limit', type=int, help='Only pool the first N gazetteer cities')
+    build_parser.add_argument('--per-query', type=int, default=10, help='Images per category or city (Unsplash allows up to 30)')
+    build_parser.add_argument('--delay', type=float, default=0.0, help='Extra seconds to wait between Unsplash requests')
+    build_parser.add_argument('--refresh', action='store_true', help='Rebuild pools that already exist')
+
+    subparsers.add_parser('stats', help='Show the number of cached entries')
+    subparsers.add_parser('purge', help='Drop expired entries')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build(limit=args.limit, per_query=min(30, max(1, args.per_query)), delay=args.delay, skip_existing=not args.refresh)
+    elif args.command == 'stats':
+        cache = ImageCache()
+        print(f" [ImageCache] {len(cache.cache)} entries in {cache.cache.path}")
+    elif args.command == 'purge':
+        print(f" [ImageCache] Removed {ImageCache().cache.purge_expired()} expired entries")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,182 +1,268 @@
 # itinerary_agent.py
 # Contains the core ItineraryAgent class for generating detailed daily plans.
-from freeDataService import FreeDataService
+import os
+from concurrent.futures import ThreadPoolExecutor
+import day_planner
+from freeDataService import FreeDataService, POI_CATEGORIES
 from datetime import date, timedelta
 
+# Worker threads for geocoding and batched Overpass calls; per-host limits in
+# FreeDataService still apply.
+PREFETCH_WORKERS = int(os.environ.get("ITINERARY_PREFETCH_WORKERS", "4"))
+# Cities fetched per background batch while streaming day plans.
+STREAM_BATCH_CITIES = int(os.environ.get("ITINERARY_STREAM_BATCH_CITIES", "4"))
+
 class ItineraryAgent:
     def __init__(self):
         self.data_service = FreeDataService()
 
+    def _empty_bundle(self):
+        return {'coordinates': None, **{category: [] for category in POI_CATEGORIES}}
+
+    def prefetch_city_bundles(self, cities):
+        """Fetches data for each of `cities` once, batching Overpass calls."""
+        cities = list(dict.fromkeys(cities))
+        if not cities:
+            return {}
+        print(f" [ItineraryAgent] Prefetching data for {len(cities)} cities...")
+        try:
+            return self.data_service.get_route_bundles(cities, max_workers=PREFETCH_WORKERS)
+        except Exception as e:
+            print(f" [ItineraryAgent] Data prefetch failed: {e}")
+            return {city: self._empty_bundle() for city in cities}
+
+    def _city_batches(self, route_data):
+        """Distinct route cities split for streaming: the first city alone, so day 1
+        is not held up by the rest of the trip, then STREAM_BATCH_CITIES at a time."""
+        cities = list(dict.fromkeys(stop['city'] for stop in route_data))
+        return [cities[:1]] + [cities[start:start + STREAM_BATCH_CITIES] for start in range(1, len(cities), STREAM_BATCH_CITIES)]
+
     def generate_itinerary(self, route_data):
-        detailed_itinerary = []
+        return list(self.iter_itinerary(route_data))
+
+    def iter_itinerary(self, route_data):
+        """Yields each day plan as soon as its city's data has been fetched.
+
+        The next batch of cities is fetched in the background while the current
+        one is planned, and a city's data is dropped after its last day, so long
+        trips never hold every city's POIs at once.
+        """
         total_days = len(route_data)
+        if not total_days:
+            return
+        last_day = {city_stop['city']: i for i, city_stop in enumerate(route_data)}
+        batches = iter(self._city_batches(route_data))
+        bundles = {}
+        loader = ThreadPoolExecutor(max_workers=1)
+        pending = loader.submit(self.prefetch_city_bundles, next(batches))
+        # Per city: attractions in visiting order, and how many have been used so far.
+        city_routes = {}
+        city_progress = {}
+        # Per city: restaurant index and the restaurants already booked.
+        city_restaurants = {}
+        city_restaurants_used = {}
         
-        for i, city_stop in enumerate(route_data):
-            destination = city_stop['city']
-            print(f" [ItineraryAgent] Generating comprehensive plan for {destination} (Day {i + 1}/{total_days})...")
-            
-            attractions = self.data_service.get_attractions(destination)
-            restaurants = self.data_service.get_restaurants(destination)
-            hotels = self.data_service.get_hotels(destination)
-
-            # Fallbacks if no data is found
-            if not attractions:
-                attractions = [
-                    {'name': f'{destination} City Center', 'description': 'Explore the historic city center', 'coordinates': None},
-                    {'name': f'{destination} Cultural District', 'description': 'Immerse in local culture', 'coordinates': None},
-                    {'name': f'{destination} Scenic Viewpoint', 'description': 'Capture stunning panoramic views', 'coordinates': None}
-                ]
-            if not restaurants:
-                restaurants = [
-                    {'name': 'Local Breakfast Spot', 'cuisine': 'Local', 'coordinates': None, 'priceLevel': '$'},
-                    {'name': 'Traditional Restaurant', 'cuisine': 'Local', 'coordinates': None, 'priceLevel': '$$'},
-                    {'name': 'Fine Dining Experience', 'cuisine': 'International', 'coordinates': None, 'priceLevel': '$$$'}
-                ]
-            if not hotels:
-                hotels = [{'name': f'{destination} Hotel', 'description': 'Comfortable accommodation', 'coordinates': None}]
-
-            # Select varied attractions for the day
-            morning_attraction = attractions[i % len(attractions)]
-            afternoon_attraction = attractions[(i + 1) % len(attractions)]
-            evening_attraction = attractions[(i + 2) % len(attractions)]
+        try:
+            for i, city_stop in enumerate(route_data):
+                destination = city_stop['city']
+                print(f" [ItineraryAgent] Generating comprehensive plan for {destination} (Day {i + 1}/{total_days})...")
             
-            # Select restaurants
-            breakfast_restaurant = restaurants[i % len(restaurants)]
-            lunch_restaurant = restaurants[(i + 1) % len(restaurants)]
-            dinner_restaurant = restaurants[(i + 2) % len(restaurants)]
+                if destination not in bundles:
+                    bundles.update(pending.result())
+                    upcoming = next(batches, None)
+                    if upcoming:
+                        pending = loader.submit(self.prefetch_city_bundles, upcoming)
+                bundle = bundles[destination]
+                attractions = bundle['attractions']
+                restaurants = bundle['restaurants']
+                hotels = bundle['hotels']
+
+                # Fallbacks if no data is found
+                if not attractions:
+                    attractions = [
+                        {'name': f'{destination} City Center', 'description': 'Explore the historic city center', 'coordinates': None},
+                        {'name': f'{destination} Cultural District', 'description': 'Immerse in local culture', 'coordinates': None},
+                        {'name': f'{destination} Scenic Viewpoint', 'description': 'Capture stunning panoramic views', 'coordinates': None}
+                    ]
+                if not restaurants:
+                    restaurants = [
+                        {'name': 'Local Breakfast Spot', 'cuisine': 'Local', 'coordinates': None, 'priceLevel': '$'},
+                        {'name': 'Traditional Restaurant', 'cuisine': 'Local', 'coordinates': None, 'priceLevel': '$$'},
+                        {'name': 'Fine Dining Experience', 'cuisine': 'International', 'coordinates': None, 'priceLevel': '$$$'}
+                    ]
+                if not hotels:
+                    hotels = [{'name': f'{destination} Hotel', 'description': 'Comfortable accommodation', 'coordinates': None}]
+
+                # Select hotel
+                hotel = hotels[i % len(hotels)]
+
+                # Walk the city's attraction route from the hotel so each day's stops
+                # are neighbours; a repeat visit picks up where the last day ended.
+                if destination not in city_routes:
+                    anchor = hotel.get('coordinates') if day_planner.has_coordinates(hotel) else bundle.get('coordinates')
+                    city_routes[destination] = day_planner.order_stops(attractions, anchor)
+                route = city_routes[destination]
+                offset = city_progress.get(destination, 0)
+                morning_attraction = route[offset % len(route)]
+                afternoon_attraction = route[(offset + 1) % len(route)]
+                evening_attraction = route[(offset + 2) % len(route)]
+                city_progress[destination] = offset + (1 if i == 0 else 3)
             
-            # Select hotel
-            hotel = hotels[i % len(hotels)]
+                # Select restaurants: breakfast near the hotel, lunch near the morning
+                # stop and dinner near the day's last stop, falling back to the list order.
+                breakfast_restaurant = restaurants[i % len(restaurants)]
+                lunch_restaurant = restaurants[(i + 1) % len(restaurants)]
+                dinner_restaurant = restaurants[(i + 2) % len(restaurants)]
+                if destination not in city_restaurants:
+                    city_restaurants[destination] = day_planner.NearestPlaces(restaurants)
+                    city_restaurants_used[destination] = set()
+                nearby = city_restaurants[destination]
+                if nearby:
+                    last_stop = morning_attraction if i == 0 else evening_attraction
+                    anchors = [
+                        item['coordinates'] if day_planner.has_coordinates(item) else None
+                        # No breakfast on the arrival day.
+                        for item in (hotel if i > 0 else None, morning_attraction, last_stop)
+                    ]
+                    breakfast_pick, lunch_pick, dinner_pick = nearby.pick(anchors, city_restaurants_used[destination])
+                    breakfast_restaurant = breakfast_pick or breakfast_restaurant
+                    lunch_restaurant = lunch_pick or lunch_restaurant
+                    dinner_restaurant = dinner_pick or dinner_restaurant
 
-            def format_location(item):
-                if item and item.get('coordinates'):
-                    coords = item['coordinates']
-                    if coords.get('lat') and coords.get('lon'):
-                        return f"{coords['lat']}, {coords['lon']}"
-                return destination
+                def format_location(item):
+                    if item and item.get('coordinates'):
+                        coords = item['coordinates']
+                        if coords.get('lat') and coords.get('lon'):
+                            return f"{coords['lat']}, {coords['lon']}"
+                    return destination
 
-            activities = []
-            activity_id = 1
+                activities = []
+                activity_id = 1
 
-            # First day: Check-in activity
-            if i == 0:
-                activities.append({
-                    "id": activity_id,
-                    "time": '14:00',
-                    "title": f"Check-in at {hotel['name']}",
-                    "type": 'hotel',
-                    "location": format_location(hotel),
-                    "notes": f"{hotel.get('description', 'Settle in and freshen up before exploring.')}",
-                    "duration": '30m',
-                    "includes": ['Room keys', 'Welcome amenities', 'Hotel orientation'],
-                    "status": 'confirmed'
-                })
-                activity_id += 1
+                # First day: Check-in activity
+                if i == 0:
+                    activities.append({
+                        "id": activity_id,
+                        "time": '14:00',
+                        "title": f"Check-in at {hotel['name']}",
+                        "type": 'hotel',
+                        "location": format_location(hotel),
+                        "notes": f"{hotel.get('description', 'Settle in and freshen up before exploring.')}",
+                        "duration": '30m',
+                        "includes": ['Room keys', 'Welcome amenities', 'Hotel orientation'],
+                        "status": 'confirmed'
+                    })
+                    activity_id += 1
 
-            # Breakfast (skip on first day - arrival day)
-            if i > 0:
-                activities.append({
-                    "id": activity_id,
-                    "time": '08:00',
-                    "title": f"Breakfast at {breakfast_restaurant['name']}",
-                    "type": 'meal',
-                    "location": format_location(breakfast_restaurant),
-                    "notes": f"Start your day with a hearty {breakfast_restaurant.get('cuisine', 'local')} breakfast.",
-                    "duration": '1h',
-                    "price": breakfast_restaurant.get('priceLevel', '$'),
-                    "includes": ['Continental breakfast', 'Fresh juice', 'Coffee/Tea']
-                })
-                activity_id += 1
+                # Breakfast (skip on first day - arrival day)
+                if i > 0:
+                    activities.append({
+                        "id": activity_id,
+                        "time": '08:00',
+                        "title": f"Breakfast at {breakfast_restaurant['name']}",
+                        "type": 'meal',
+                        "location": format_location(breakfast_restaurant),
+                        "notes": f"Start your day with a hearty {breakfast_restaurant.get('cuisine', 'local')} breakfast.",
+                        "duration": '1h',
+                        "price": breakfast_restaurant.get('priceLevel', '$'),
+                        "includes": ['Continental breakfast', 'Fresh juice', 'Coffee/Tea']
+                    })
+                    activity_id += 1
 
-            # Morning sightseeing
-            activities.append({
-                "id": activity_id,
-                "time": '16:00' if i == 0 else '09:30',  # Later start on arrival day
-                "title": f"Explore {morning_attraction['name']}",
-                "type": 'sightseeing',
-                "location": format_location(morning_attraction),
-                "notes": morning_attraction.get('description', 'Start the day by soaking in the local highlights.'),
-                "duration": '3h',
-                "status": 'recommended'
-            })
-            activity_id += 1
-
-            # Lunch
-            activities.append({
-                "id": activity_id,
-                "time": '19:00' if i == 0 else '12:30',  # Later lunch on arrival day
-                "title": f"Lunch at {lunch_restaurant['name']}",
-                "type": 'meal',
-                "location": format_location(lunch_restaurant),
-                "notes": f"{lunch_restaurant.get('cuisine', 'Local')} cuisine pick for the afternoon.",
-                "duration": '1h 30m',
-                "price": lunch_restaurant.get('priceLevel', '$$')
-            })
-            activity_id += 1
-
-            # Afternoon activities (skip on arrival day)
-            if i > 0:
+                # Morning sightseeing
                 activities.append({
                     "id": activity_id,
-                    "time": '15:30',
-                    "title": f"Afternoon at {afternoon_attraction['name']}",
+                    "time": '16:00' if i == 0 else '09:30',  # Later start on arrival day
+                    "title": f"Explore {morning_attraction['name']}",
                     "type": 'sightseeing',
-                    "location": format_location(afternoon_attraction),
-                    "notes": afternoon_attraction.get('description', 'A perfect mid-day cultural stop.'),
-                    "duration": '2h',
-                    "status": 'suggested'
+                    "location": format_location(morning_attraction),
+                    "notes": morning_attraction.get('description', 'Start the day by soaking in the local highlights.'),
+                    "duration": '3h',
+                    "status": 'recommended'
                 })
                 activity_id += 1
 
+                # Lunch
                 activities.append({
                     "id": activity_id,
-                    "time": '18:00',
-                    "title": f"Golden Hour at {evening_attraction['name']}",
-                    "type": 'sightseeing',
-                    "location": format_location(evening_attraction),
-                    "notes": evening_attraction.get('description', 'Capture sunset moments before dinner.'),
+                    "time": '19:00' if i == 0 else '12:30',  # Later lunch on arrival day
+                    "title": f"Lunch at {lunch_restaurant['name']}",
+                    "type": 'meal',
+                    "location": format_location(lunch_restaurant),
+                    "notes": f"{lunch_restaurant.get('cuisine', 'Local')} cuisine pick for the afternoon.",
                     "duration": '1h 30m',
-                    "status": 'optional'
+                    "price": lunch_restaurant.get('priceLevel', '$$')
                 })
                 activity_id += 1
 
-            # Dinner
-            activities.append({
-                "id": activity_id,
-                "time": '20:00',
-                "title": f"Dinner at {dinner_restaurant['name']}",
-                "type": 'meal',
-                "location": format_location(dinner_restaurant),
-                "notes": f"{dinner_restaurant.get('cuisine', 'Local')} cuisine to wrap up the day.",
-                "duration": '2h',
-                "price": dinner_restaurant.get('priceLevel', '$$')
-            })
-            activity_id += 1
-
-            # Last day: Check-out activity
-            if i == total_days - 1:
+                # Afternoon activities (skip on arrival day)
+                if i > 0:
+                    activities.append({
+                        "id": activity_id,
+                        "time": '15:30',
+                        "title": f"Afternoon at {afternoon_attraction['name']}",
+                        "type": 'sightseeing',
+                        "location": format_location(afternoon_attraction),
+                        "notes": afternoon_attraction.get('description', 'A perfect mid-day cultural stop.'),
+                        "duration": '2h',
+                        "status": 'suggested'
+                    })
+                    activity_id += 1
+
+                    activities.append({
+                        "id": activity_id,
+                        "time": '18:00',
+                        "title": f"Golden Hour at {evening_attraction['name']}",
+                        "type": 'sightseeing',
+                        "location": format_location(evening_attraction),
+                        "notes": evening_attraction.get('description', 'Capture sunset moments before dinner.'),
+                        "duration": '1h 30m',
+                        "status": 'optional'
+                    })
+                    activity_id += 1
+
+                # Dinner
                 activities.append({
                     "id": activity_id,
-                    "time": '11:00',
-                    "title": f"Check-out from {hotel['name']}",
-                    "type": 'hotel',
-                    "location": format_location(hotel),
-                    "notes": 'Hotel check-out. Collect luggage and prepare for departure.',
-                    "duration": '30m',
-                    "includes": ['Final bill settlement', 'Luggage assistance', 'Transportation arrangement'],
-                    "status": 'confirmed'
+                    "time": '20:00',
+                    "title": f"Dinner at {dinner_restaurant['name']}",
+                    "type": 'meal',
+                    "location": format_location(dinner_restaurant),
+                    "notes": f"{dinner_restaurant.get('cuisine', 'Local')} cuisine to wrap up the day.",
+                    "duration": '2h',
+                    "price": dinner_restaurant.get('priceLevel', '$$')
                 })
                 activity_id += 1
 
-            day_plan = {
-                "id": i + 1,
-                "day": i + 1,
-                "city": destination,
-                "title": f"Day {i + 1}: {'Arrival & First Impressions' if i == 0 else 'Final Discoveries & Departure' if i == total_days - 1 else 'Discovery & Moments'}",
-                "weather": city_stop.get('weather', {}),
-                "activities": activities
-            }
-            detailed_itinerary.append(day_plan)
-            print(f" [ItineraryAgent] Generated {len(activities)} activities for Day {i + 1}")
-            
-        return detailed_itinerary
+                # Last day: Check-out activity
+                if i == total_days - 1:
+                    activities.append({
+                        "id": activity_id,
+                        "time": '11:00',
+                        "title": f"Check-out from {hotel['name']}",
+                        "type": 'hotel',
+                        "location": format_location(hotel),
+                        "notes": 'Hotel check-out. Collect luggage and prepare for departure.',
+                        "duration": '30m',
+                        "includes": ['Final bill settlement', 'Luggage assistance', 'Transportation arrangement'],
+                        "status": 'confirmed'
+                    })
+                    activity_id += 1
+
+                day_plan = {
+                    "id": i + 1,
+                    "day": i + 1,
+                    "city": destination,
+                    "title": f"Day {i + 1}: {'Arrival & First Impressions' if i == 0 else 'Final Discoveries & Departure' if i == total_days - 1 else 'Discovery & Moments'}",
+                    "weather": city_stop.get('weather', {}),
+                    "activities": activities
+                }
+                print(f" [ItineraryAgent] Generated {len(activities)} activities for Day {i + 1}")
+                if last_day[destination] == i:
+                    for per_city in (bundles, city_routes, city_progress, city_restaurants, city_restaurants_used):
+                        per_city.pop(destination, None)
+                yield day_plan
+        finally:
+            # Also runs when the consumer stops early or a day fails: drop the
+            # pending prefetch instead of leaving the loader thread behind.
+            loader.shutdown(wait=False, cancel_futures=True)
@@ -3,6 +3,7 @@
 import pika
 import json
 import time
+import metrics
 from itinerary_agent import ItineraryAgent
 
 def on_request(ch, method, props, body):
@@ -15,8 +16,17 @@ def on_request(ch, method, props, body):
         try:
             itinerary_agent = ItineraryAgent()
             # The payload now contains the combined route and weather data
-            detailed_itinerary = itinerary_agent.generate_itinerary(payload.get("route_with_weather"))
-            
+            route_with_weather = payload.get("route_with_weather") or []
+            detailed_itinerary = []
+            # Publish each day as it is planned so the orchestrator can start on it.
+            for day_plan in itinerary_agent.iter_itinerary(route_with_weather):
+                detailed_itinerary.append(day_plan)
+                chunk_message = {
+                    "trip_id": trip_id, "intent": "ItineraryDayGenerated",
+                    "payload": {"day": day_plan, "total_days": len(route_with_weather)}
+                }
+                ch.basic_publish(exchange='', routing_key='orchestrator_queue', body=json.dumps(chunk_message))
+
             response_message = {
                 "trip_id": trip_id, "intent": "ItineraryGenerated", "payload": {"itinerary": detailed_itinerary}
             }
@@ -24,6 +34,7 @@ def on_request(ch, method, props, body):
             print(f" [ItineraryAgent] Sent detailed itinerary for trip '{trip_id}' back to orchestrator.")
         except Exception as e:
             print(f" [ItineraryAgent] Error generating itinerary: {e}")
+    metrics.dump('itinerary_agent')
     ch.basic_ack(delivery_tag=method.delivery_tag)
 
 def start_agent():
@@ -1,5 +1,6 @@
 # mapAgent.py
 import requests
+import rate_limiter
 from math import radians, sin, cos, sqrt, atan2
 
 class MapAgent:
@@ -267,6 +268,7 @@ class MapAgent:
         url = "https://nominatim.openstreetmap.org/search"
         params = {"q": city_name, "format": "json", "limit": 1}
         headers = {"User-Agent": "mcp-ai-travel-app"}
+        rate_limiter.acquire(url, rate_limiter.PRIORITY_INTERACTIVE)
         response = requests.get(url, params=params, headers=headers)
         response.raise_for_status()
         data = response.json()
@@ -2,6 +2,7 @@
 import pika
 import json
 import time
+import metrics
 from map_agent import MapAgent # We reuse your existing class
 
 def on_request(ch, method, props, body):
@@ -72,6 +73,7 @@ def on_request(ch, method, props, body):
             )
             print(f" [MapAgent] Sent fallback route for trip '{trip_id}'.")
 
+    metrics.dump('map_agent')
     ch.basic_ack(delivery_tag=method.delivery_tag)
 
 def start_agent():
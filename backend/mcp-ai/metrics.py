@@ -0,0 +1,77 @@
+# metrics.py
+# Process-local counters, gauges and timing summaries for the agents.
+# Set AGENT_METRICS_DIR to have each agent write a JSON snapshot after every job.
+import json
+import os
+import threading
+import time
+
+
+def _key(name, labels):
+    if not labels:
+        return name
+    rendered = ','.join(f'{label}="{value}"' for label, value in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def add_gauge(self, name, delta, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.setdefault(key, {'count': 0, 'sum': 0.0, 'max': 0.0})
+            summary['count'] += 1
+            summary['sum'] += value
+            summary['max'] = max(summary['max'], value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'summaries': {key: dict(value) for key, value in self._summaries.items()},
+            }
+
+    def dump(self, agent_name):
+        directory = os.environ.get("AGENT_METRICS_DIR")
+        if not directory:
+            return
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{agent_name}.json")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as handle:
+                json.dump(self.snapshot(), handle, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f" [Metrics] Could not write metrics for {agent_name}: {e}")
+
+
+registry = MetricsRegistry()
+inc = registry.inc
+set_gauge = registry.set_gauge
+add_gauge = registry.add_gauge
+observe = registry.observe
+snapshot = registry.snapshot
+dump = registry.dump
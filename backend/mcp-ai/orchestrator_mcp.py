@@ -118,6 +118,13 @@ class Orchestrator:
                 self.trip_states[trip_id]["route_with_weather"] = route_with_weather
                 self.request_itinerary(trip_id, route_with_weather)
 
+            elif intent == "ItineraryDayGenerated":
+                # Partial plan while the itinerary agent is still working; the
+                # full list arrives with ItineraryGenerated.
+                day_plan = payload.get("day", {})
+                self.trip_states[trip_id].setdefault("itinerary", []).append(day_plan)
+                self.send_status_update(trip_id, f"Planned day {day_plan.get('day')}/{payload.get('total_days')} in {day_plan.get('city')}.")
+
             elif intent == "ItineraryGenerated":
                 self.trip_states[trip_id]["itinerary"] = payload.get("itinerary")
                 cities = [day['city'] for day in payload.get("itinerary", [])]
@@ -200,6 +207,17 @@ class Orchestrator:
         end_date = original_request.get("end_date") or itinerary[-1].get("date")
         adults = original_request.get("adults") or original_request.get("travellers") or 1
 
+        # Overnight stops in visiting order: consecutive itinerary days in one
+        # city form a stop, and the last day is check-out.
+        stops = []
+        for day in itinerary:
+            if stops and stops[-1]["city"] == day.get("city"):
+                stops[-1]["nights"] += 1
+            else:
+                stops.append({"city": day.get("city"), "nights": 1})
+        if stops:
+            stops[-1]["nights"] -= 1
+
         payload = {
             "start_city": start_city,
             "end_city": end_city,
@@ -210,6 +228,10 @@ class Orchestrator:
             "adults": adults,
             "num_days": original_request.get("num_days")
         }
+        # Per-leg pricing only for routes that stay overnight in more than one
+        # city; a single stay (e.g. train_flight trips) is priced start to end.
+        if len({stop["city"] for stop in stops if stop["nights"] > 0}) > 1:
+            payload["stops"] = stops
 
         message = {
             "trip_id": trip_id,
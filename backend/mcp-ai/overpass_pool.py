@@ -0,0 +1,152 @@
+# overpass_pool.py
+# A pool of Overpass API endpoints ranked by recent latency and error rate.
+# Each query goes to the healthiest endpoint; if it runs past that endpoint's
+# p90 latency a hedged duplicate goes to the runner-up and the first answer wins.
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+import requests
+
+import metrics
+import rate_limiter
+from hedging import LatencyTracker, run_hedged
+
+DEFAULT_OVERPASS_ENDPOINTS = [
+    'https://overpass-api.de/api/interpreter',
+    'https://overpass.kumi.systems/api/interpreter',
+    'https://overpass.private.coffee/api/interpreter',
+]
+
+# Assumed latency for endpoints without samples yet, so new mirrors get tried.
+UNKNOWN_LATENCY = 5.0
+HEDGE_DEFAULT_DELAY = float(os.environ.get("OVERPASS_HEDGE_DEFAULT_DELAY", "8"))
+HEDGE_MIN_DELAY = float(os.environ.get("OVERPASS_HEDGE_MIN_DELAY", "1"))
+MIN_SAMPLES_FOR_P90 = 5
+
+
+class OverpassError(Exception):
+    pass
+
+
+class OverpassPool:
+    def __init__(self, endpoints, hedge=True):
+        self.endpoints = list(dict.fromkeys(endpoints))
+        self.hedge = hedge
+        self.health = {endpoint: LatencyTracker() for endpoint in self.endpoints}
+
+    def score(self, endpoint):
+        tracker = self.health[endpoint]
+        latency = tracker.percentile(0.5, default=UNKNOWN_LATENCY)
+        return latency * (1 + 4 * tracker.error_rate())
+
+    def ranked(self):
+        return sorted(self.endpoints, key=self.score)
+
+    def hedge_delay(self, endpoint):
+        tracker = self.health[endpoint]
+        if tracker.samples < MIN_SAMPLES_FOR_P90:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, tracker.percentile(0.9))
+
+    def _reserve(self, endpoint, priority):
+        """Waits for a rate-limit token, then a host slot. Returns (stack holding
+        the slot, release function); closing the stack frees the slot."""
+        rate_limiter.acquire(endpoint, priority)
+        stack = ExitStack()
+        release = stack.enter_context(rate_limiter.host_slot(endpoint, priority))
+        return stack, release
+
+    def _attempt(self, endpoint, query, timeout, priority, attempt=None, reserved=None):
+        stack, release = reserved or self._reserve(endpoint, priority)
+        with stack:
+            if attempt is not None and not attempt.hold(release):
+                raise OverpassError("Hedged attempt cancelled before it was sent")
+            started = time.monotonic()
+            try:
+                response = requests.post(endpoint, data=query, headers={'User-Agent': 'TravelApp/1.0'}, timeout=timeout)
+                response.raise_for_status()
+                payload = response.json()
+                remark = payload.get('remark', '')
+                if 'error' in remark.lower() and not payload.get('elements'):
+                    # Overpass reports timeouts and memory exhaustion with HTTP 200.
+                    raise OverpassError(remark)
+            except Exception:
+                self.health[endpoint].record_error()
+                metrics.inc('overpass_requests_total', endpoint=endpoint, outcome='error')
+                raise
+        elapsed = time.monotonic() - started
+        self.health[endpoint].record(elapsed)
+        metrics.inc('overpass_requests_total', endpoint=endpoint, outcome='ok')
+        metrics.observe('overpass_latency_seconds', elapsed, endpoint=endpoint)
+        return payload.get('elements', [])
+
+    def post(self, query, timeout=30, priority=rate_limiter.PRIORITY_NORMAL):
+        candidates = self.ranked()
+        attempts = [HedgedAttempt() for _ in candidates]
+        # The hedge delay is network latency, so the primary waits for its token
+        # and slot before the hedge clock starts; local queueing never triggers a hedge.
+        reserved = self._reserve(candidates[0], priority)
+        calls = [
+            (lambda endpoint=endpoint, attempt=attempt, index=index: self._attempt(
+                endpoint, query, timeout, priority, attempt, reserved if index == 0 else None))
+            for index, (endpoint, attempt) in enumerate(zip(candidates, attempts))
+        ]
+        try:
+            # One hedge to the runner-up; any further endpoints are failover-only.
+            index, elements = run_hedged(
+                calls,
+                self.hedge_delay(candidates[0]),
+                cancels=[attempt.cancel for attempt in attempts],
+                max_hedges=1 if self.hedge else 0,
+            )
+        finally:
+            # No-op once the primary has run; frees the slot if it never started.
+            reserved[1]()
+        if index > 0:
+            metrics.inc('overpass_hedge_wins_total', endpoint=candidates[index])
+        return elements
+
+
+class HedgedAttempt:
+    """Lets an attempt that lost a hedge give its host slot back straight away.
+
+    requests cannot abort a POST in flight, so the losing request still runs to
+    its timeout, but it no longer holds one of the host's slots while it does.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._release = None
+        self.cancelled = False
+
+    def hold(self, release):
+        """Records the attempt's slot release; False if it was already cancelled."""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self._release = release
+            return True
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            release, self._release = self._release, None
+        if release:
+            release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool, so endpoint health is shared by every FreeDataService."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            configured = os.environ.get("OVERPASS_ENDPOINTS", "")
+            endpoints = [url.strip() for url in configured.split(',') if url.strip()] or DEFAULT_OVERPASS_ENDPOINTS
+            _pool = OverpassPool(endpoints, hedge=os.environ.get("OVERPASS_HEDGE", "1") != "0")
+        return _pool
@@ -0,0 +1,125 @@
+# poi_cache.py
+# Persistent cache for Overpass POI lists and Nominatim geocodes, plus a CLI
+# to pre-warm it for every city in the MapAgent gazetteer.
+#
+#   python poi_cache.py warm            # fetch every gazetteer city not yet cached
+#   python poi_cache.py stats
+#   python poi_cache.py purge
+import argparse
+import os
+import time
+
+from disk_cache import DiskCache
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'poi_cache.sqlite3')
+
+# OSM POIs change on a scale of weeks; restaurants churn faster than landmarks.
+DEFAULT_TTL_DAYS = {
+    'attractions': 30,
+    'restaurants': 7,
+    'hotels': 14,
+}
+GEOCODE_TTL_DAYS = 90
+
+
+def _days(value):
+    return float(value) * 24 * 3600
+
+
+class POICache:
+    """POI lists keyed by (rounded centre, radius, category), and geocodes keyed by name."""
+
+    def __init__(self, path=None, max_entries=None, precision=None):
+        self.cache = DiskCache(
+            path or os.environ.get("POI_CACHE_PATH", DEFAULT_CACHE_PATH),
+            max_entries=max_entries or int(os.environ.get("POI_CACHE_MAX_ENTRIES", "20000")),
+        )
+        # Two decimals is roughly 1 km, well inside the 3-5 km search radii.
+        self.precision = int(precision if precision is not None else os.environ.get("POI_CACHE_PRECISION", "2"))
+
+    @staticmethod
+    def ttl_for(category):
+        env_value = os.environ.get(f"POI_CACHE_TTL_DAYS_{category.upper()}")
+        return _days(env_value if env_value else DEFAULT_TTL_DAYS.get(category, 7))
+
+    def _poi_key(self, category, lat, lon, radius):
+        return f"poi:{category}:{round(lat, self.precision)}:{round(lon, self.precision)}:{radius}"
+
+    def get_pois(self, category, lat, lon, radius):
+        return self.cache.get(self._poi_key(category, lat, lon, radius))
+
+    def set_pois(self, category, lat, lon, radius, pois):
+        self.cache.set(self._poi_key(category, lat, lon, radius), pois, self.ttl_for(category))
+
+    @staticmethod
+    def _geocode_key(destination):
+        return f"geocode:{' '.join(str(destination).lower().split())}"
+
+    def get_coordinates(self, destination):
+        return self.cache.get(self._geocode_key(destination))
+
+    def set_coordinates(self, destination, coords):
+        ttl = _days(os.environ.get("GEOCODE_CACHE_TTL_DAYS", GEOCODE_TTL_DAYS))
+        self.cache.set(self._geocode_key(destination), coords, ttl)
+
+
+def warm(limit=None, delay=0.0, use_gazetteer_coordinates=True):
+    import rate_limiter
+    from freeDataService import FreeDataService, POI_CATEGORIES
+    from map_agent import MapAgent
+
+    # Background priority: live itinerary requests, in this or any other process,
+    # are served first by the shared rate limiter and host slots.
+    service = FreeDataService(priority=rate_limiter.PRIORITY_BACKGROUND)
+    if service.poi_cache is None:
+        print(" [POICache] Cache is disabled (POI_CACHE_ENABLED=0); nothing to warm.")
+        return
+
+    cities = MapAgent.MAJOR_CITIES[:limit] if limit else MapAgent.MAJOR_CITIES
+    for index, city in enumerate(cities, start=1):
+        name = city['name']
+        coords = service.poi_cache.get_coordinates(name)
+        if coords is None and use_gazetteer_coordinates:
+            coords = {'lat': city['lat'], 'lon': city['lon']}
+            service.poi_cache.set_coordinates(name, coords)
+
+        cached = coords is not None and all(
+            service.poi_cache.get_pois(category, coords['lat'], coords['lon'], spec['radius']) is not None
+            for category, spec in POI_CATEGORIES.items()
+        )
+        if cached:
+            print(f" [POICache] ({index}/{len(cities)}) {name}: already warm")
+            continue
+
+        bundle = service.get_city_bundle(name)
+        counts = ', '.join(f"{len(bundle[category])} {category}" for category in POI_CATEGORIES)
+        print(f" [POICache] ({index}/{len(cities)}) {name}: {counts}")
+        if delay:
+            time.sleep(delay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the on-disk Overpass POI cache.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    warm_parser = subparsers.add_parser('warm', help='Fetch POIs for every gazetteer city that is not cached yet')
+    warm_parser.add_argument('--limit', type=int, help='Only warm the first N gazetteer cities')
+    warm_parser.add_argument('--delay', type=float, default=0.0, help='Extra seconds to wait between cities on top of the shared rate limits')
+    warm_parser.add_argument('--geocode', action='store_true', help='Geocode through Nominatim instead of using gazetteer coordinates')
+
+    subparsers.add_parser('stats', help='Show the number of cached entries')
+    subparsers.add_parser('purge', help='Drop expired entries')
+
+    args = parser.parse_args()
+    if args.command == 'warm':
+        warm(limit=args.limit, delay=args.delay, use_gazetteer_coordinates=not args.geocode)
+    elif args.command == 'stats':
+        cache = POICache()
+        print(f" [POICache] {len(cache.cache)} entries in {cache.cache.path}")
+    elif args.command == 'purge':
+        removed = POICache().cache.purge_expired()
+        print(f" [POICache] Removed {removed} expired entries")
+
+
+if __name__ == '__main__':
+    main()
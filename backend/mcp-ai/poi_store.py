@@ -0,0 +1,227 @@
+# poi_store.py
+# Optional offline POI database built from an OSM extract. It answers the same
+# around:radius lookups FreeDataService sends to Overpass, from a local SQLite
+# file with an R-tree index.
+#
+#   python poi_store.py build india-latest.osm.bz2 --db cache/poi_store.sqlite3
+#   python poi_store.py query --db cache/poi_store.sqlite3 hotels 15.49 73.83
+#
+# PBF extracts need converting first, e.g. `osmium cat extract.osm.pbf -o extract.osm`
+# (optionally after `osmium tags-filter` to keep the file small).
+import argparse
+import bz2
+import gzip
+import json
+import os
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from math import radians, sin, cos, sqrt, atan2
+
+# Tags copied from the extract; enough for FreeDataService's formatters.
+KEPT_TAGS = ('name', 'tourism', 'historic', 'leisure', 'amenity', 'cuisine', 'description')
+
+METRES_PER_DEGREE = 111320.0
+BATCH_SIZE = 5000
+
+
+def classify(tags):
+    """(category, kind) pairs for a node, mirroring the Overpass filters."""
+    matches = []
+    tourism = tags.get('tourism')
+    if tourism in ('attraction', 'museum', 'viewpoint'):
+        matches.append(('attractions', tourism))
+    elif 'historic' in tags:
+        matches.append(('attractions', 'historic'))
+    elif tags.get('leisure') in ('park', 'garden'):
+        matches.append(('attractions', tags['leisure']))
+    if tags.get('amenity') in ('restaurant', 'cafe'):
+        matches.append(('restaurants', tags['amenity']))
+    if tourism in ('hotel', 'guest_house'):
+        matches.append(('hotels', tourism))
+    return matches
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return 6371000 * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def _open_extract(path):
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.pbf'):
+        raise ValueError("PBF extracts are not supported directly; convert with `osmium cat extract.osm.pbf -o extract.osm`")
+    return open(path, 'rb')
+
+
+class POIStore:
+    """Read side of the offline POI database."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        self.use_rtree = meta.get('index') == 'rtree'
+        self.bounds = tuple(float(meta[key]) for key in ('min_lat', 'max_lat', 'min_lon', 'max_lon')) if 'min_lat' in meta else None
+
+    @classmethod
+    def from_env(cls):
+        path = os.environ.get("POI_STORE_PATH")
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except sqlite3.Error as e:
+            print(f" [POIStore] Could not open {path}: {e}")
+            return None
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=10)
+
+    def covers(self, lat, lon):
+        """Cheap bounding-box check; extracts rarely fill their box, so callers
+        still treat an empty lookup as "not covered"."""
+        if not self.bounds:
+            return False
+        min_lat, max_lat, min_lon, max_lon = self.bounds
+        return min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+
+    def query_around(self, category, lat, lon, radius, limit=None):
+        """Overpass-shaped node elements within `radius` metres, nearest first."""
+        dlat = radius / METRES_PER_DEGREE
+        dlon = radius / (METRES_PER_DEGREE * max(cos(radians(lat)), 1e-6))
+        box = (lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+        if self.use_rtree:
+            sql = (
+                "SELECT p.osm_id, p.lat, p.lon, p.tags FROM poi_index AS i JOIN pois AS p ON p.id = i.id"
+                " WHERE i.min_lat >= ? AND i.max_lat <= ? AND i.min_lon >= ? AND i.max_lon <= ? AND p.category = ?"
+            )
+        else:
+            sql = (
+                "SELECT osm_id, lat, lon, tags FROM pois"
+                " WHERE lat BETWEEN ? AND ? AND lon BETWEEN ? AND ? AND category = ?"
+            )
+        with self._connect() as conn:
+            rows = conn.execute(sql, (*box, category)).fetchall()
+
+        elements = []
+        for osm_id, poi_lat, poi_lon, tags in rows:
+            distance = haversine_m(lat, lon, poi_lat, poi_lon)
+            if distance <= radius:
+                elements.append((distance, {'type': 'node', 'id': osm_id, 'lat': poi_lat, 'lon': poi_lon, 'tags': json.loads(tags)}))
+        elements.sort(key=lambda item: item[0])
+        return [element for _, element in elements[:limit]]
+
+
+def build(extract_path, db_path):
+    """Creates (or replaces) the store from an .osm / .osm.bz2 / .osm.gz extract."""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{db_path}.building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    started = time.time()
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute(
+        "CREATE TABLE pois (id INTEGER PRIMARY KEY, osm_id INTEGER, category TEXT, kind TEXT,"
+        " lat REAL, lon REAL, tags TEXT)"
+    )
+    try:
+        conn.execute("CREATE VIRTUAL TABLE poi_index USING rtree(id, min_lat, max_lat, min_lon, max_lon)")
+        index = 'rtree'
+    except sqlite3.OperationalError:
+        print(" [POIStore] SQLite lacks the R-tree module; using a B-tree index on (lat, lon).")
+        index = 'btree'
+
+    bounds = [90.0, -90.0, 180.0, -180.0]
+    batch = []
+    count = 0
+
+    def flush():
+        conn.executemany("INSERT INTO pois (osm_id, category, kind, lat, lon, tags) VALUES (?, ?, ?, ?, ?, ?)", batch)
+        batch.clear()
+
+    with _open_extract(extract_path) as handle:
+        root = None
+        for event, elem in ET.iterparse(handle, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag == 'bounds':
+                bounds = [float(elem.get('minlat')), float(elem.get('maxlat')), float(elem.get('minlon')), float(elem.get('maxlon'))]
+                continue
+            if elem.tag == 'node':
+                tags = {child.get('k'): child.get('v') for child in elem if child.tag == 'tag'}
+                if 'name' in tags:
+                    lat, lon = float(elem.get('lat')), float(elem.get('lon'))
+                    for category, kind in classify(tags):
+                        batch.append((int(elem.get('id')), category, kind, lat, lon, json.dumps({key: tags[key] for key in KEPT_TAGS if key in tags})))
+                        count += 1
+                if len(batch) >= BATCH_SIZE:
+                    flush()
+            elif elem.tag not in ('way', 'relation'):
+                continue
+            # A top-level element is done: drop it from the root so memory stays
+            # flat whether or not it produced POIs.
+            root.clear()
+    flush()
+
+    if index == 'rtree':
+        conn.execute("INSERT INTO poi_index SELECT id, lat, lat, lon, lon FROM pois")
+    else:
+        conn.execute("CREATE INDEX pois_lat_lon ON pois (lat, lon)")
+    if bounds[0] > bounds[1]:
+        row = conn.execute("SELECT MIN(lat), MAX(lat), MIN(lon), MAX(lon) FROM pois").fetchone()
+        bounds = list(row) if row[0] is not None else None
+    meta = {'index': index, 'source': os.path.basename(extract_path), 'built_at': str(int(time.time()))}
+    if bounds:
+        meta.update(dict(zip(('min_lat', 'max_lat', 'min_lon', 'max_lon'), map(str, bounds))))
+    conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", meta.items())
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    os.replace(tmp_path, db_path)
+    print(f" [POIStore] Stored {count} POIs in {db_path} ({index} index) in {time.time() - started:.1f}s")
+
+
+def main():
+    default_db = os.environ.get("POI_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'poi_store.sqlite3'))
+    parser = argparse.ArgumentParser(description='Offline POI database for FreeDataService.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build the store from an OSM XML extract')
+    build_parser.add_argument('extract', help='Path to an .osm, .osm.bz2 or .osm.gz file')
+    build_parser.add_argument('--db', default=default_db)
+
+    query_parser = subparsers.add_parser('query', help='Run an around:radius lookup against the store')
+    query_parser.add_argument('category', choices=['attractions', 'restaurants', 'hotels'])
+    query_parser.add_argument('lat', type=float)
+    query_parser.add_argument('lon', type=float)
+    query_parser.add_argument('--radius', type=int, default=5000)
+    query_parser.add_argument('--limit', type=int, default=20)
+    query_parser.add_argument('--db', default=default_db)
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build(args.extract, args.db)
+    else:
+        store = POIStore(args.db)
+        started = time.perf_counter()
+        elements = store.query_around(args.category, args.lat, args.lon, args.radius, args.limit)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for element in elements:
+            print(f"{element['tags'].get('name')} ({element['lat']}, {element['lon']})")
+        print(f" [POIStore] {len(elements)} results in {elapsed_ms:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# price_cache.py
+# Short-lived in-process cache of /travel price responses for BudgetAgent.
+# Prices move quickly, so entries live for minutes; empty answers get their
+# own (shorter) TTL. Concurrent misses for the same key share one request.
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_NEGATIVE_TTL_SECONDS = 60
+
+
+def price_key(params):
+    """(origin IATA, destination IATA, check-in, check-out, adults) for a /travel query."""
+    return (
+        str(params.get("origin", "")).upper(),
+        str(params.get("destination", "")).upper(),
+        params.get("checkInDate"),
+        params.get("checkOutDate"),
+        int(params.get("adults", 1)),
+    )
+
+
+def is_empty(data):
+    if not isinstance(data, dict):
+        return True
+    return not any(isinstance(data.get(kind), list) and data.get(kind) for kind in ("flights", "trains", "hotels"))
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class PriceCache:
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, negative_ttl=DEFAULT_NEGATIVE_TTL_SECONDS, max_entries=2000):
+        self.ttl = float(ttl)
+        self.negative_ttl = float(negative_ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._lookup(key, time.monotonic())
+        return copy.deepcopy(entry[1]) if entry else None
+
+    def expires_in(self, key):
+        """Seconds until the entry expires, or None when it is absent."""
+        with self._lock:
+            entry = self._lookup(key, time.monotonic())
+        return entry[0] - time.monotonic() if entry else None
+
+    def set(self, key, value):
+        ttl = self.negative_ttl if is_empty(value) else self.ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_fetch(self, key, fetch):
+        """Cached value for key, else fetch() once for every concurrent caller.
+
+        Errors from fetch() are raised to all waiting callers and not cached.
+        """
+        with self._lock:
+            entry = self._lookup(key, time.monotonic())
+            if entry:
+                metrics.inc('price_cache_total', outcome='hit')
+                return copy.deepcopy(entry[1])
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            metrics.inc('price_cache_total', outcome='shared')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.value)
+
+        metrics.inc('price_cache_total', outcome='miss')
+        try:
+            flight.value = fetch()
+            self.set(key, flight.value)
+            return copy.deepcopy(flight.value)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache shared by every BudgetAgent, or None when disabled."""
+    global _cache
+    if os.environ.get("BUDGET_PRICE_CACHE_ENABLED", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = PriceCache(
+                ttl=float(os.environ.get("BUDGET_PRICE_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+                negative_ttl=float(os.environ.get("BUDGET_PRICE_CACHE_NEGATIVE_TTL", DEFAULT_NEGATIVE_TTL_SECONDS)),
+                max_entries=int(os.environ.get("BUDGET_PRICE_CACHE_MAX_ENTRIES", "2000")),
+            )
+        return _cache
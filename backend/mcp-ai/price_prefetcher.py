@@ -0,0 +1,135 @@
+# price_prefetcher.py
+# Keeps the price cache warm for the routes people actually ask about. Every
+# /travel lookup is counted with exponential decay; a background thread
+# refreshes the hottest entries shortly before they expire, spending at most
+# BUDGET_PREFETCH_MAX_PER_MINUTE upstream requests.
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+import metrics
+import price_cache
+from circuit_breaker import get_breaker
+
+HALF_LIFE_SECONDS = float(os.environ.get("BUDGET_PREFETCH_HALF_LIFE", "3600"))
+TOP_N = int(os.environ.get("BUDGET_PREFETCH_TOP_N", "20"))
+REFRESH_AHEAD_SECONDS = float(os.environ.get("BUDGET_PREFETCH_REFRESH_AHEAD", "60"))
+INTERVAL_SECONDS = float(os.environ.get("BUDGET_PREFETCH_INTERVAL", "15"))
+MAX_PER_MINUTE = float(os.environ.get("BUDGET_PREFETCH_MAX_PER_MINUTE", "10"))
+MAX_TRACKED = 2000
+# Decayed request count a route needs before it is refreshed. Two requests
+# score 1 + 2^(-gap / half-life), so 1.5 is reached by two requests within one
+# half-life of each other (while the newer one is still recent).
+MIN_SCORE = float(os.environ.get("BUDGET_PREFETCH_MIN_SCORE", "1.5"))
+# Routes are forgotten once their score decays below this (one request two
+# half-lives ago), so new routes still have time to build up a score.
+FORGET_SCORE = 0.25
+
+
+class HotRouteTracker:
+    """Decaying request counts per price-cache key, with the params to refetch it."""
+
+    def __init__(self, half_life=HALF_LIFE_SECONDS, max_tracked=MAX_TRACKED):
+        self.decay = math.log(2) / max(1.0, half_life)
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self._routes = {}  # key -> [score, updated_at, params]
+
+    def _score(self, entry, now):
+        return entry[0] * math.exp(-self.decay * (now - entry[1]))
+
+    def record(self, params):
+        key = price_cache.price_key(params)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._routes.get(key)
+            score = self._score(entry, now) if entry else 0.0
+            self._routes[key] = [score + 1.0, now, dict(params)]
+            if len(self._routes) > self.max_tracked:
+                coldest = min(self._routes, key=lambda route: self._score(self._routes[route], now))
+                del self._routes[coldest]
+
+    def hottest(self, n, min_score=MIN_SCORE):
+        """[(key, params)] of up to n routes scoring at least `min_score` whose
+        check-in is not past, hottest first. Cold and past routes are dropped."""
+        now = time.monotonic()
+        today = datetime.utcnow().date().isoformat()
+        with self._lock:
+            scores = {key: self._score(entry, now) for key, entry in self._routes.items()}
+            for key, score in scores.items():
+                if score < FORGET_SCORE or (key[2] or today) < today:
+                    del self._routes[key]
+            ranked = sorted(
+                ((key, entry) for key, entry in self._routes.items() if scores[key] >= min_score),
+                key=lambda item: scores[item[0]],
+                reverse=True,
+            )
+        return [(key, entry[2]) for key, entry in ranked[:n]]
+
+
+tracker = HotRouteTracker()
+
+
+def record(params):
+    tracker.record(params)
+
+
+class PricePrefetcher:
+    def __init__(self, agent, cache=None):
+        self.agent = agent
+        self.cache = cache or price_cache.get_cache()
+        self._stop = threading.Event()
+        self._thread = None
+        self._allowance = MAX_PER_MINUTE
+        self._allowance_at = time.monotonic()
+
+    def _take_request(self):
+        now = time.monotonic()
+        self._allowance = min(MAX_PER_MINUTE, self._allowance + (now - self._allowance_at) * MAX_PER_MINUTE / 60.0)
+        self._allowance_at = now
+        if self._allowance < 1.0:
+            return False
+        self._allowance -= 1.0
+        return True
+
+    def refresh_due(self):
+        """Refreshes hot entries that are missing or about to expire; returns how many."""
+        refreshed = 0
+        for key, params in tracker.hottest(TOP_N):
+            remaining = self.cache.expires_in(key)
+            if remaining is not None and remaining > REFRESH_AHEAD_SECONDS:
+                continue
+            if not self._take_request():
+                metrics.inc('price_prefetch_total', outcome='over_budget')
+                break
+            try:
+                data = get_breaker("travel_api").call(self.agent._get_travel, params)
+            except Exception as exc:
+                metrics.inc('price_prefetch_total', outcome='error')
+                print(f" [PricePrefetcher] Refresh failed for {key[0]}->{key[1]} {key[2]}: {exc}")
+                continue
+            self.cache.set(key, data)
+            refreshed += 1
+            metrics.inc('price_prefetch_total', outcome='refreshed')
+        return refreshed
+
+    def _run(self):
+        while not self._stop.wait(INTERVAL_SECONDS):
+            try:
+                self.refresh_due()
+            except Exception as exc:
+                print(f" [PricePrefetcher] Error: {exc}")
+
+    def start(self):
+        if self.cache is None:
+            print(" [PricePrefetcher] Price cache disabled; prefetcher not started.")
+            return self
+        self._thread = threading.Thread(target=self._run, name="price-prefetcher", daemon=True)
+        self._thread.start()
+        print(f" [PricePrefetcher] Keeping the top {TOP_N} routes warm (max {MAX_PER_MINUTE:g} requests/min).")
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,244 @@
+# rate_limiter.py
+# Token-bucket rate limiting per upstream host, shared by every agent process.
+# Bucket state lives in a small file guarded by an exclusive lock, so the map,
+# itinerary and cache-warming processes all draw from the same budget.
+# Waiters are served in priority order, within a process and across processes.
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: coordination falls back to this process only
+    fcntl = None
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BACKGROUND = 10
+
+# host -> (requests per second, burst). Nominatim's policy is 1 req/s;
+# overpass-api.de hands out only a couple of slots per client.
+HOST_RATE_LIMITS = {
+    'nominatim.openstreetmap.org': (
+        float(os.environ.get("NOMINATIM_RATE_PER_SEC", "1")),
+        float(os.environ.get("NOMINATIM_RATE_BURST", "1")),
+    ),
+    'overpass-api.de': (
+        float(os.environ.get("OVERPASS_RATE_PER_SEC", "0.5")),
+        float(os.environ.get("OVERPASS_RATE_BURST", "2")),
+    ),
+}
+DEFAULT_RATE_LIMIT = (1.0, 2.0)
+
+STATE_DIR = os.environ.get("RATE_LIMIT_STATE_DIR", os.path.join(tempfile.gettempdir(), "roundtable-rate-limits"))
+
+# Waiters registered in the shared bucket file are forgotten after this long
+# without a refresh, so a crashed process cannot block the others. Registered
+# waiters re-check at least every WAITER_POLL_SECONDS.
+WAITER_TTL_SECONDS = 5.0
+WAITER_POLL_SECONDS = 1.0
+
+
+class TokenBucket:
+    def __init__(self, name, rate, burst, state_dir=STATE_DIR):
+        self.name = name
+        self.rate = max(rate, 1e-6)
+        self.burst = max(burst, 1.0)
+        os.makedirs(state_dir, exist_ok=True)
+        self.path = os.path.join(state_dir, f"{name}.bucket")
+        self._local_state = {'tokens': self.burst, 'updated': time.time()}
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state.get('updated', now))
+        state['tokens'] = min(self.burst, state.get('tokens', self.burst) + elapsed * self.rate)
+        state['updated'] = now
+
+    def _update(self, state, now, waiter, priority):
+        """Takes a token unless a more urgent waiter (in any process) is queued.
+
+        Otherwise registers `waiter` in the shared state and returns the seconds
+        to wait before trying again.
+        """
+        self._refill(state, now)
+        waiters = {key: entry for key, entry in state.get('waiters', {}).items() if entry[1] > now}
+        ahead = any(entry[0] < priority for key, entry in waiters.items() if key != waiter)
+        if not ahead and state['tokens'] >= 1:
+            state['tokens'] -= 1
+            waiters.pop(waiter, None)
+            wait = 0.0
+        else:
+            waiters[waiter] = [priority, now + WAITER_TTL_SECONDS]
+            wait = WAITER_POLL_SECONDS if ahead else (1 - state['tokens']) / self.rate
+        state['waiters'] = waiters
+        return wait
+
+    def _forget(self, state, now, waiter):
+        state.get('waiters', {}).pop(waiter, None)
+        return 0.0
+
+    def _with_state(self, update, *args):
+        now = time.time()
+        if fcntl is None:
+            return update(self._local_state, now, *args)
+
+        with open(self.path, 'a+', encoding='utf-8') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                handle.seek(0)
+                try:
+                    state = json.loads(handle.read() or '{}')
+                except ValueError:
+                    state = {}
+                result = update(state, now, *args)
+                handle.seek(0)
+                handle.truncate()
+                handle.write(json.dumps(state))
+                handle.flush()
+                return result
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _take(self, waiter, priority):
+        """Takes a token if one is available; otherwise returns the seconds to wait."""
+        return self._with_state(self._update, waiter, priority)
+
+    def acquire(self, priority=PRIORITY_NORMAL, timeout=None):
+        """Blocks until a token is granted and returns the seconds spent waiting.
+
+        Waiters are served in priority order within the process, and the head
+        of each process's queue is registered in the shared bucket file so
+        lower-priority processes (e.g. cache warming) yield to it.
+        Raises TimeoutError when `timeout` elapses first.
+        """
+        started = time.monotonic()
+        entry = (priority, next(self._sequence))
+        waiter = f"{os.getpid()}:{threading.get_ident()}:{entry[1]}"
+        registered = False
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            metrics.set_gauge('rate_limit_queue_depth', len(self._waiters), host=self.name)
+            try:
+                while True:
+                    if self._waiters[0] == entry:
+                        wait = self._take(waiter, priority)
+                        if wait == 0.0:
+                            registered = False
+                            break
+                        registered = True
+                        wait = min(wait, WAITER_POLL_SECONDS)
+                    else:
+                        # Someone ahead of us is next; they notify once served.
+                        wait = None
+                    if timeout is not None:
+                        remaining = timeout - (time.monotonic() - started)
+                        if remaining <= 0:
+                            metrics.inc('rate_limit_timeouts_total', host=self.name)
+                            raise TimeoutError(f"Rate limit wait for {self.name} exceeded {timeout}s")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                if registered:
+                    self._with_state(self._forget, waiter)
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                metrics.set_gauge('rate_limit_queue_depth', len(self._waiters), host=self.name)
+                self._cond.notify_all()
+
+        waited = time.monotonic() - started
+        metrics.inc('rate_limit_acquired_total', host=self.name)
+        metrics.observe('rate_limit_wait_seconds', waited, host=self.name, priority=priority)
+        if waited >= 1.0:
+            print(f" [RateLimiter] Waited {waited:.1f}s for a {self.name} request slot")
+        return waited
+
+
+class PrioritySlots:
+    """Counting semaphore whose waiters are admitted in priority order."""
+
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    @contextmanager
+    def hold(self, priority=PRIORITY_NORMAL):
+        entry = (priority, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            while self._waiters[0] != entry or self._in_use >= self.limit:
+                self._cond.wait()
+            heapq.heappop(self._waiters)
+            self._in_use += 1
+            self._cond.notify_all()
+        released = False
+
+        def release():
+            """Gives the slot back early (e.g. for an abandoned hedged attempt)."""
+            nonlocal released
+            with self._cond:
+                if released:
+                    return
+                released = True
+                self._in_use -= 1
+                self._cond.notify_all()
+
+        try:
+            yield release
+        finally:
+            release()
+
+
+# Requests allowed in flight per upstream host, shared by every worker thread
+# in the process (ItineraryAgent prefetches cities in parallel).
+HOST_CONCURRENCY = {
+    'nominatim.openstreetmap.org': int(os.environ.get("NOMINATIM_MAX_CONCURRENCY", "1")),
+    'overpass-api.de': int(os.environ.get("OVERPASS_MAX_CONCURRENCY", "2")),
+}
+DEFAULT_HOST_CONCURRENCY = 2
+
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def host_slot(url, priority=PRIORITY_NORMAL):
+    """Context manager holding one of the host's in-flight request slots; it
+    yields a function that releases the slot before the block ends.
+
+    Take the rate-limit token first (`acquire`), then the slot, so a queued
+    background request never sits on the slot an interactive one needs.
+    """
+    host = urlparse(url).hostname or url
+    with _host_slots_lock:
+        if host not in _host_slots:
+            _host_slots[host] = PrioritySlots(HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY))
+        slots = _host_slots[host]
+    return slots.hold(priority)
+
+
+def bucket_for(url):
+    host = urlparse(url).hostname or url
+    with _buckets_lock:
+        if host not in _buckets:
+            rate, burst = HOST_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT)
+            _buckets[host] = TokenBucket(host, rate, burst)
+        return _buckets[host]
+
+
+def acquire(url, priority=PRIORITY_NORMAL, timeout=None):
+    return bucket_for(url).acquire(priority=priority, timeout=timeout)
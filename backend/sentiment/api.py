@@ -9,6 +9,7 @@ matplotlib.use('Agg')  # Set backend before importing pyplot
 import matplotlib.pyplot as plt
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer
+from sparse_features import scale_features, model_for
 
 app = Flask(__name__)
 STOPWORDS = set(stopwords.words("english"))
@@ -66,9 +67,9 @@ def predict():
 
 def predict_sentiment(text):
     processed = preprocess_text(text)
-    vectorized = cv.transform([processed]).toarray()
-    scaled = scaler.transform(vectorized)
-    prediction = predictor.predict(scaled)[0]
+    vectorized = cv.transform([processed])
+    model, scaled = model_for(predictor, scale_features(scaler, vectorized))
+    prediction = model.predict(scaled)[0]
     return "Positive" if prediction == 1 else "Negative"
 
 if __name__ == "__main__":
@@ -5,10 +5,12 @@ import argparse
 import re
 import pandas as pd
 import pickle
+from functools import lru_cache
 import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem import PorterStemmer
+from sparse_features import scale_features, model_for
 
 # Get the directory of the current script
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -44,6 +46,14 @@ except Exception as e:
     print(f"Warning: Could not load models ({e}). Using fallback sentiment analysis.", file=sys.stderr)
     model = None
 
+# Built once and shared by every call
+STOPWORDS = set(stopwords.words('english'))
+STEMMER = PorterStemmer()
+
+@lru_cache(maxsize=50000)
+def stem(token):
+    return STEMMER.stem(token)
+
 def preprocess_text(text):
     """
     Preprocess text for sentiment analysis
@@ -60,12 +70,8 @@ def preprocess_text(text):
     # Tokenize
     tokens = word_tokenize(text)
     
-    # Remove stopwords
-    stop_words = set(stopwords.words('english'))
-    tokens = [token for token in tokens if token not in stop_words]
-    
-    stemmer = PorterStemmer()
-    tokens = [stemmer.stem(token) for token in tokens]
+    # Remove stopwords and stem
+    tokens = [stem(token) for token in tokens if token not in STOPWORDS]
     
     return ' '.join(tokens)
 
@@ -91,49 +97,58 @@ def predict_sentiment(text):
     """
     Predict sentiment for a single text
     """
-    # Preprocess the text
-    processed_text = preprocess_text(text)
-    
-    if processed_text == '':
-        return {'prediction': 0, 'confidence': 0.5}
-    
+    return predict_batch([text])[0]
+
+def predict_batch(texts):
+    """
+    Predict sentiment for multiple texts with one vectorizer, scaler and model call
+    """
+    texts = list(texts)
+    processed_texts = [preprocess_text(text) for text in texts]
+    results = [None] * len(texts)
+
+    # Empty texts are neutral; everything else is scored together
+    rows = []
+    for index, processed_text in enumerate(processed_texts):
+        if processed_text == '':
+            results[index] = {'prediction': 0, 'confidence': 0.5}
+        else:
+            rows.append(index)
+
     # Use ML model if available, otherwise use simple analysis
-    if model is not None and scaler is not None and vectorizer is not None:
+    if rows and model is not None and scaler is not None and vectorizer is not None:
         try:
             # Transform text using vectorizer
-            text_vectorized = vectorizer.transform([processed_text])
-            
-            # Scale the features
-            text_scaled = scaler.transform(text_vectorized.toarray())
+            text_vectorized = vectorizer.transform([processed_texts[index] for index in rows])
             
-            # Make prediction
-            prediction = model.predict(text_scaled)[0]
+            # Scale the features, keeping them sparse where the model allows it
+            predictor, text_scaled = model_for(model, scale_features(scaler, text_vectorized))
             
-            # Get prediction probability for confidence
+            # Predict labels and confidence from the class probabilities
             try:
-                probabilities = model.predict_proba(text_scaled)[0]
-                confidence = max(probabilities)
-            except:
-                confidence = 0.7  # Default confidence if predict_proba is not available
+                probabilities = predictor.predict_proba(text_scaled)
+                confidences = probabilities.max(axis=1)
+                if hasattr(predictor, 'classes_'):
+                    predictions = predictor.classes_[probabilities.argmax(axis=1)]
+                else:
+                    predictions = predictor.predict(text_scaled)
+            except AttributeError:
+                predictions = predictor.predict(text_scaled)
+                confidences = [0.7] * len(rows)  # Default confidence if predict_proba is not available
             
-            return {'prediction': prediction, 'confidence': confidence}
+            for index, prediction, confidence in zip(rows, predictions, confidences):
+                results[index] = {'prediction': prediction.item() if hasattr(prediction, 'item') else prediction,
+                                  'confidence': float(confidence)}
+            rows = []
         except Exception as e:
             print(f"ML model prediction failed: {e}", file=sys.stderr)
             # Fall back to simple analysis
             pass
     
     # Fallback to simple sentiment analysis
-    prediction, confidence = simple_sentiment_analysis(text)
-    return {'prediction': prediction, 'confidence': confidence}
-
-def predict_batch(texts):
-    """
-    Predict sentiment for multiple texts
-    """
-    results = []
-    for text in texts:
-        result = predict_sentiment(text)
-        results.append(result)
+    for index in rows:
+        prediction, confidence = simple_sentiment_analysis(texts[index])
+        results[index] = {'prediction': prediction, 'confidence': confidence}
     return results
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+import sys
+import os
+import json
+import argparse
+import queue
+import threading
+import time
+
+# Requests waiting at most this long are scored together in one batch
+DEFAULT_MAX_WAIT_MS = float(os.environ.get('SENTIMENT_BATCH_WAIT_MS', '5'))
+DEFAULT_MAX_BATCH = int(os.environ.get('SENTIMENT_MAX_BATCH', '256'))
+
+
+def load_engine(name):
+    """
+    Return the predict_batch function of the chosen engine, loading it once
+    """
+    if name == 'model':
+        import main
+        return main.predict_batch
+    import simple_sentiment
+    return simple_sentiment.predict_batch
+
+
+def to_json_result(result):
+    """
+    Convert numpy scalars from the model into plain JSON values
+    """
+    return {'prediction': int(result['prediction']), 'confidence': float(result['confidence'])}
+
+
+def read_requests(pending):
+    """
+    Read JSON-lines requests from stdin until it closes
+    """
+    for line in iter(sys.stdin.readline, ''):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            pending.put({'id': None, 'error': 'Invalid JSON format'})
+            continue
+        if not isinstance(request, dict):
+            pending.put({'id': None, 'error': 'Request must be a JSON object'})
+            continue
+        pending.put(request)
+    pending.put(None)
+
+
+def collect_batch(pending, max_wait, max_batch):
+    """
+    Block for the first request, then gather whatever arrives within max_wait
+    seconds or until max_batch texts are queued. Returns None once stdin closes.
+    """
+    first = pending.get()
+    if first is None:
+        return None
+    batch = [first]
+    size = len(first.get('texts') or [None])
+    deadline = time.monotonic() + max_wait
+    while size < max_batch:
+        remaining = deadline - time.monotonic()
+        try:
+            request = pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait()
+        except queue.Empty:
+            break
+        if request is None:
+            pending.put(None)
+            break
+        batch.append(request)
+        size += len(request.get('texts') or [None])
+    return batch
+
+
+def serve(predict_batch, out, max_wait, max_batch):
+    pending = queue.Queue()
+    threading.Thread(target=read_requests, args=(pending,), daemon=True).start()
+
+    while True:
+        batch = collect_batch(pending, max_wait, max_batch)
+        if batch is None:
+            break
+
+        # Flatten every request's texts into one prediction call
+        texts = []
+        spans = []
+        replies = []
+        for request in batch:
+            if 'error' in request:
+                replies.append({'id': request.get('id'), 'error': request['error']})
+            elif isinstance(request.get('texts'), list):
+                spans.append((request, len(texts), len(request['texts'])))
+                texts.extend(str(text or '') for text in request['texts'])
+            elif 'text' in request:
+                spans.append((request, len(texts), None))
+                texts.append(str(request['text'] or ''))
+            else:
+                replies.append({'id': request.get('id'), 'error': 'No text provided'})
+
+        if texts:
+            try:
+                results = [to_json_result(result) for result in predict_batch(texts)]
+            except Exception as e:
+                print(f"Batch prediction failed: {e}", file=sys.stderr)
+                results = None
+            for request, start, count in spans:
+                if results is None:
+                    replies.append({'id': request.get('id'), 'error': 'Prediction failed'})
+                elif count is None:
+                    replies.append({'id': request.get('id'), 'result': results[start]})
+                else:
+                    replies.append({'id': request.get('id'), 'results': results[start:start + count]})
+
+        out.write(''.join(json.dumps(reply) + '\n' for reply in replies))
+        out.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Long-running sentiment worker (JSON lines over stdin/stdout)')
+    parser.add_argument('--engine', choices=['simple', 'model'], default=os.environ.get('SENTIMENT_ENGINE', 'simple'),
+                        help='simple: rule-based scorer; model: trained models from main.py')
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help='How long to wait for more requests before scoring a batch')
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help='Most texts scored in one batch')
+
+    args = parser.parse_args()
+
+    # Replies own stdout; anything the engines print goes to stderr
+    out = sys.stdout
+    sys.stdout = sys.stderr
+
+    predict_batch = load_engine(args.engine)
+    print(f"Sentiment worker ready (engine: {args.engine})", file=sys.stderr)
+    serve(predict_batch, out, args.max_wait_ms / 1000.0, args.max_batch)
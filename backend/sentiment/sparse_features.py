@@ -0,0 +1,81 @@
+import sys
+import copy
+import json
+import numpy as np
+from scipy import sparse
+
+# Model id -> copy of the model that reads CSR input like dense input (None if unsupported)
+_sparse_models = {}
+
+def scale_features(scaler, features):
+    """
+    Apply a fitted MinMaxScaler to CountVectorizer output without densifying it.
+
+    When every feature's minimum was zero (always true for counts seen with
+    zeros in training) the scaler maps zero to zero, so it is a per-column
+    multiply on the stored values. Otherwise falls back to the dense transform.
+    """
+    scale = getattr(scaler, 'scale_', None)
+    offset = getattr(scaler, 'min_', None)
+    if not sparse.issparse(features) or scale is None or offset is None or np.any(offset):
+        return scaler.transform(features.toarray() if sparse.issparse(features) else features)
+
+    scaled = (features.astype(np.float64) @ sparse.diags(scale)).tocsr()
+    if getattr(scaler, 'clip', False):
+        low, high = scaler.feature_range
+        if not low <= 0 <= high:
+            return scaler.transform(features.toarray())
+        np.clip(scaled.data, low, high, out=scaled.data)
+    return scaled
+
+def _booster_trees(model_json):
+    """
+    The trees in a booster's JSON dump, for gbtree and dart boosters
+    """
+    booster = model_json['learner']['gradient_booster']
+    booster = booster.get('gbtree', booster)
+    return booster['model']['trees']
+
+def sparse_model(model):
+    """
+    XGBoost treats entries absent from a CSR matrix as missing, not as zero,
+    and routes them down each split's default branch. Our features are never
+    missing, so dense predictions never use that branch; pointing it where a
+    zero would go (left when 0 < threshold) leaves dense predictions unchanged
+    and makes CSR input score exactly like dense input.
+
+    Returns such a copy of an XGBoost model, or None for other models.
+    """
+    if id(model) in _sparse_models:
+        return _sparse_models[id(model)]
+
+    converted = None
+    if hasattr(model, 'get_booster'):
+        try:
+            model_json = json.loads(model.get_booster().save_raw(raw_format='json'))
+            for tree in _booster_trees(model_json):
+                if any(int(split_type) != 0 for split_type in tree.get('split_type', [])):
+                    raise ValueError('categorical splits')
+                tree['default_left'] = [
+                    int(left_child != -1 and threshold > 0)
+                    for left_child, threshold in zip(tree['left_children'], tree['split_conditions'])
+                ]
+            converted = copy.deepcopy(model)
+            converted.get_booster().load_model(bytearray(json.dumps(model_json), 'utf-8'))
+        except Exception as e:
+            print(f"Sparse features unavailable for this model ({e}); using dense features", file=sys.stderr)
+            converted = None
+    _sparse_models[id(model)] = converted
+    return converted
+
+def model_for(model, scaled):
+    """
+    Return the (model, features) pair to predict with: CSR features with the
+    sparse-ready copy when there is one, otherwise dense features with `model`.
+    """
+    if sparse.issparse(scaled):
+        converted = sparse_model(model)
+        if converted is None:
+            return model, scaled.toarray()
+        return converted, scaled.tocsr()
+    return model, scaled
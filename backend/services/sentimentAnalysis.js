@@ -1,12 +1,138 @@
 import { spawn } from 'child_process';
 import path from 'path';
+import readline from 'readline';
 import { fileURLToPath } from 'url';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
-// Path to the sentiment analysis Python script
-const SENTIMENT_SCRIPT_PATH = path.join(__dirname, '../sentiment/main.py');
+// Long-running worker that loads the sentiment engine once and batches requests
+const SENTIMENT_DIR = path.join(__dirname, '../sentiment');
+const SENTIMENT_SERVER_PATH = path.join(SENTIMENT_DIR, 'sentiment_server.py');
+const PYTHON_PATH = process.env.PYTHON_PATH || 'python';
+const SENTIMENT_ENGINE = process.env.SENTIMENT_ENGINE || 'simple';
+const REQUEST_TIMEOUT_MS = Number(process.env.SENTIMENT_TIMEOUT_MS) || 10000;
+// Pause before restarting a worker that exited, so a broken install doesn't spawn per call
+const RESTART_DELAY_MS = 1000;
+
+const NEUTRAL_RESULT = { sentiment: 'neutral', confidence: 0.5 };
+
+const sentimentMap = {
+  1: 'positive',
+  0: 'neutral',
+  '-1': 'negative',
+  [-1]: 'negative'
+};
+
+let worker = null;
+let restartAfter = 0;
+let nextRequestId = 1;
+const pendingRequests = new Map();
+
+const settleAll = () => {
+  for (const [id, entry] of pendingRequests) {
+    clearTimeout(entry.timer);
+    pendingRequests.delete(id);
+    entry.resolve(null);
+  }
+};
+
+const startWorker = () => {
+  const child = spawn(PYTHON_PATH, [SENTIMENT_SERVER_PATH, '--engine', SENTIMENT_ENGINE], {
+    cwd: SENTIMENT_DIR,
+  });
+
+  readline.createInterface({ input: child.stdout }).on('line', (line) => {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (error) {
+      console.error('Error parsing sentiment worker output:', line);
+      return;
+    }
+    const entry = pendingRequests.get(message.id);
+    if (!entry) {
+      return;
+    }
+    clearTimeout(entry.timer);
+    pendingRequests.delete(message.id);
+    if (message.error) {
+      console.error('Sentiment analysis error:', message.error);
+    }
+    entry.resolve(message);
+  });
+
+  child.stderr.on('data', (data) => {
+    const message = data.toString().trim();
+    if (message) {
+      console.error('[sentiment]', message);
+    }
+  });
+
+  child.stdin.on('error', (error) => {
+    console.error('Sentiment worker stdin error:', error.message);
+  });
+
+  child.on('error', (error) => {
+    console.error('Failed to start sentiment analysis:', error);
+  });
+
+  child.on('exit', (code, signal) => {
+    console.error('Sentiment worker exited - code:', code, 'signal:', signal);
+    if (worker === child) {
+      worker = null;
+      restartAfter = Date.now() + RESTART_DELAY_MS;
+      settleAll();
+    }
+  });
+
+  // The worker must not keep short-lived scripts alive; pending request timers do that
+  child.unref();
+  child.stdin.unref();
+  child.stdout.unref();
+  child.stderr.unref();
+  return child;
+};
+
+const getWorker = () => {
+  if (!worker && Date.now() >= restartAfter) {
+    worker = startWorker();
+  }
+  return worker;
+};
+
+/**
+ * Send one request to the sentiment worker
+ * @param {Object} payload - {text} or {texts}
+ * @returns {Promise<Object|null>} The worker's reply, or null on failure or timeout
+ */
+const requestSentiment = (payload) => {
+  return new Promise((resolve) => {
+    const child = getWorker();
+    if (!child) {
+      return resolve(null);
+    }
+
+    const id = nextRequestId++;
+    const timer = setTimeout(() => {
+      pendingRequests.delete(id);
+      console.error(`Sentiment analysis timed out after ${REQUEST_TIMEOUT_MS}ms`);
+      resolve(null);
+    }, REQUEST_TIMEOUT_MS);
+    pendingRequests.set(id, { resolve, timer });
+    child.stdin.write(`${JSON.stringify({ id, ...payload })}\n`);
+  });
+};
+
+const toSentiment = (result) => {
+  if (!result) {
+    return { ...NEUTRAL_RESULT };
+  }
+  return {
+    sentiment: sentimentMap[result.prediction] || 'neutral',
+    confidence: result.confidence || 0.5
+  };
+};
 
 /**
  * Analyze sentiment of text using the trained model
@@ -14,61 +140,8 @@ const SENTIMENT_SCRIPT_PATH = path.join(__dirname, '../sentiment/main.py');
  * @returns {Promise<{sentiment: string, confidence: number}>}
  */
 export const analyzeSentiment = async (text) => {
-  return new Promise((resolve) => {
-    const sentimentDir = path.join(__dirname, '../sentiment');
-    const scriptPath = path.join(sentimentDir, 'simple_sentiment.py');
-    const escapedText = text.trim().replace(/"/g, '\\"').replace(/\n/g, '\\n');
-
-    const python = spawn('python', [scriptPath, '--text', escapedText], {
-      cwd: sentimentDir,
-    });
-
-    let stdout = '';
-    let stderr = '';
-
-    python.stdout.on('data', (data) => {
-      stdout += data.toString();
-    });
-
-    python.stderr.on('data', (data) => {
-      stderr += data.toString();
-    });
-
-    python.on('close', (code) => {
-      if (code !== 0) {
-        console.error('Sentiment analysis error - exit code:', code, 'stderr:', stderr);
-        return resolve({ sentiment: 'neutral', confidence: 0.5 });
-      }
-
-      try {
-        const cleanOutput = stdout.trim();
-        const result = JSON.parse(cleanOutput);
-        
-        const sentimentMap = {
-          1: 'positive',
-          0: 'neutral',
-          '-1': 'negative',
-          [-1]: 'negative'
-        };
-        
-        const finalResult = {
-          sentiment: sentimentMap[result.prediction] || 'neutral',
-          confidence: result.confidence || 0.5
-        };
-        
-        resolve(finalResult);
-      } catch (error) {
-        console.error('Error parsing sentiment analysis result:', error);
-        console.error('Raw stdout was:', stdout);
-        resolve({ sentiment: 'neutral', confidence: 0.5 });
-      }
-    });
-
-    python.on('error', (error) => {
-      console.error('Failed to start sentiment analysis:', error);
-      resolve({ sentiment: 'neutral', confidence: 0.5 });
-    });
-  });
+  const reply = await requestSentiment({ text: String(text ?? '').trim() });
+  return toSentiment(reply?.result);
 };
 
 /**
@@ -81,25 +154,9 @@ export const analyzeSentimentBatch = async (texts) => {
     return [];
   }
 
-  const sentimentDir = path.join(__dirname, '../sentiment');
-  const escapedText = texts.map(text => text.trim().replace(/"/g, '\\"').replace(/\n/g, '\\n')).join('\n');
-
-  try {
-    const result = await execAsync(`python "${path.join(sentimentDir, 'simple_sentiment.py')}" --text "${escapedText}"`, {
-      cwd: sentimentDir,
-      timeout: 10000,
-    });
-    return result.split('\n').map(line => {
-      const [sentiment, confidence] = line.split(',');
-      return {
-        sentiment,
-        confidence: parseFloat(confidence) || 0.5
-      };
-    });
-  } catch (error) {
-    console.error('Batch sentiment analysis error:', error);
-    return texts.map(() => ({ sentiment: 'neutral', confidence: 0.5 }));
-  }
+  const reply = await requestSentiment({ texts: texts.map(text => String(text ?? '').trim()) });
+  const results = Array.isArray(reply?.results) ? reply.results : [];
+  return texts.map((_, index) => toSentiment(results[index]));
 };
 
 /**